@@ -1,17 +1,18 @@
 """The Vakio Openair integration."""
 from __future__ import annotations
 
-import asyncio
 import logging
 
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import ConfigEntryAuthFailed, ConfigEntryNotReady
+from homeassistant.exceptions import ConfigEntryNotReady
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.typing import ConfigType
 
-from .const import DOMAIN, ERROR_AUTH, ERROR_CONFIG_NO_TREADY, PLATFORMS
-from .vakio import Coordinator, MqttClient
+from .const import CONF_TOPIC, DOMAIN, ERROR_CONFIG_NO_TREADY, PLATFORMS
+from .services import async_setup_services
+from .storage import get_state_cache
+from .vakio import Coordinator
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
@@ -21,6 +22,7 @@ CONFIG_SCHEMA = cv.empty_config_schema(DOMAIN)
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the demo environment."""
     _LOGGER.info("Function __init__.async_setup() called")
+    async_setup_services(hass)
 
     return True
 
@@ -34,25 +36,26 @@ async def async_setup_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> b
     for key, value in config_entry.data.items():
         data[key] = value
 
-    broker = MqttClient(hass, data)
+    coordinator: Coordinator = Coordinator(hass, data, dict(config_entry.options))
 
-    # Попытка подключения к брокеру
-    if not await broker.try_connect():
-        raise ConfigEntryAuthFailed(ERROR_AUTH)
+    # Последнее известное состояние доступно сразу, до подключения к брокеру
+    await coordinator.async_restore()
 
-    coordinator: Coordinator = Coordinator(hass, data)
-    await coordinator.async_config_entry_first_refresh()
-    if not coordinator.last_update_success:
+    # Быстрая проверка брокера вне цикла событий, само подключение выполняется в фоне
+    if not await coordinator.mqttc.try_connect():
+        await coordinator.async_shutdown()
         raise ConfigEntryNotReady(ERROR_CONFIG_NO_TREADY)
 
     # Регистрация интеграции в hass
     hass.data[DOMAIN][config_entry.entry_id] = coordinator
-    config_entry.add_update_listener(async_reload_entry)
     config_entry.async_on_unload(
         config_entry.add_update_listener(config_entry_update_listener)
     )
     await hass.config_entries.async_forward_entry_setups(config_entry, PLATFORMS)
 
+    # Подключение к брокеру через общее для всех устройств соединение
+    coordinator.async_start()
+
     return True
 
 
@@ -64,30 +67,23 @@ async def config_entry_update_listener(
 
 
 async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> bool:
-    """Unload a config entry."""
-    await asyncio.gather(
-        hass.config_entries.async_unload_platforms(config_entry, PLATFORMS),
-        return_exceptions=True,
+    """Unload a config entry.
+
+    Платформы выгружаются один раз. Координатор останавливает свои таймеры и
+    фоновые задачи, а последнее устройство на соединении закрывает его.
+    """
+    unload_ok = await hass.config_entries.async_unload_platforms(
+        config_entry, PLATFORMS
     )
+    if not unload_ok:
+        return False
 
-    unload_ok: bool = False
-    if DOMAIN not in hass.data:
-        return True
-    if config_entry.entry_id in hass.data[DOMAIN]:
-        # coordinator = hass.data[DOMAIN][config_entry.entry_id]
-        unload_ok = all(
-            await asyncio.gather(
-                *[
-                    hass.config_entries.async_forward_entry_unload(
-                        config_entry, platform
-                    )
-                    for platform in PLATFORMS
-                ]
-            )
-        )
-        unload_ok = True
-    if unload_ok:
-        hass.data[DOMAIN].pop(config_entry.entry_id)
+    coordinator: Coordinator | None = hass.data.get(DOMAIN, {}).pop(
+        config_entry.entry_id, None
+    )
+    if coordinator is not None:
+        await coordinator.async_shutdown()
+        await coordinator.mqttc.disconnect()
         _LOGGER.debug(
             "Координатор Coordinator() домена %s удалён, entry_id: %s",
             DOMAIN,
@@ -95,10 +91,10 @@ async def async_unload_entry(hass: HomeAssistant, config_entry: ConfigEntry) ->
         )
 
     return True
-    # return unload_ok
 
 
-async def async_reload_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
-    """Перезагрузка интеграции."""
-    await async_unload_entry(hass, config_entry)
-    await async_setup_entry(hass, config_entry)
+async def async_remove_entry(hass: HomeAssistant, config_entry: ConfigEntry) -> None:
+    """Удаление сохранённого состояния устройства."""
+    cache = get_state_cache(hass)
+    await cache.async_load()
+    cache.async_remove(config_entry.data[CONF_TOPIC])
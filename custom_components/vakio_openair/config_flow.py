@@ -11,9 +11,13 @@ from homeassistant.core import HomeAssistant, callback
 from homeassistant.data_entry_flow import FlowResult
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.selector import (
+    BooleanSelector,
     NumberSelector,
     NumberSelectorConfig,
     NumberSelectorMode,
+    SelectSelector,
+    SelectSelectorConfig,
+    SelectSelectorMode,
     TextSelector,
     TextSelectorConfig,
     TextSelectorType,
@@ -24,18 +28,58 @@ from .const import (
     CONF_PASSWORD,
     CONF_PORT,
     CONF_TOPIC,
+    CONF_TRANSPORT,
     CONF_USERNAME,
+    CONTROLLER_HYSTERESIS,
+    CONTROLLER_OFF,
+    CONTROLLER_PI,
+    DEFAULT_COMMAND_TIMEOUT,
+    DEFAULT_CONTROLLER,
+    DEFAULT_CONTROLLER_DWELL,
+    DEFAULT_CONTROLLER_KI,
+    DEFAULT_CONTROLLER_KP,
+    DEFAULT_DEADBAND,
+    DEFAULT_DEADBAND_PERCENT,
+    DEFAULT_HUMIDITY_HYSTERESIS,
+    DEFAULT_HUMIDITY_SETPOINT,
+    DEFAULT_LATENCY_SAMPLE,
+    DEFAULT_MAX_WRITE_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
     DEFAULT_PORT,
+    DEFAULT_PUBLISH_RETRIES,
+    DEFAULT_QOS,
     DEFAULT_SMART_EMERG_SHUNT,
     DEFAULT_SMART_GATE,
     DEFAULT_SMART_SPEED,
     DEFAULT_TOPIC,
+    DEFAULT_TRANSPORT,
     DOMAIN,
+    OPT_COMMAND_TIMEOUT,
+    OPT_CONTROLLER,
+    OPT_CONTROLLER_DWELL,
+    OPT_CONTROLLER_KI,
+    OPT_CONTROLLER_KP,
+    OPT_CONTROLLER_MIN_TEMP,
+    OPT_DIAGNOSTIC_SENSORS,
+    OPT_DEADBAND,
+    OPT_DEADBAND_PERCENT,
     OPT_EMERG_SHUNT,
+    OPT_HUMIDITY_HYSTERESIS,
+    OPT_HUMIDITY_SETPOINT,
+    OPT_LATENCY_SAMPLE,
+    OPT_MAX_WRITE_INTERVAL,
+    OPT_MIN_WRITE_INTERVAL,
+    OPT_PUBLISH_RETRIES,
+    OPT_QOS,
     OPT_SMART_GATE,
     OPT_SMART_SPEED,
+    OPT_STATISTICS_WINDOWS,
+    OPT_TRACE,
+    STATISTICS_WINDOWS,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_THREAD,
 )
-from .vakio import Coordinator, MqttClient
+from .vakio import SENSOR_ENDPOINTS, Coordinator, MqttClient
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -44,6 +88,13 @@ PORT_SELECTOR = vol.All(
     NumberSelector(NumberSelectorConfig(mode=NumberSelectorMode.BOX, min=1, max=65535)),
     vol.Coerce(int),
 )
+TRANSPORT_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=[TRANSPORT_ASYNCIO, TRANSPORT_THREAD],
+        mode=SelectSelectorMode.DROPDOWN,
+        translation_key=CONF_TRANSPORT,
+    )
+)
 PASSWORD_SELECTOR = TextSelector(TextSelectorConfig(type=TextSelectorType.PASSWORD))
 GATE_SELECTOR = vol.All(
     NumberSelector(NumberSelectorConfig(mode=NumberSelectorMode.SLIDER, min=1, max=4)),
@@ -57,7 +108,107 @@ TEMP_SELECTOR = vol.All(
     NumberSelector(NumberSelectorConfig(mode=NumberSelectorMode.BOX, min=1, max=15)),
     vol.Coerce(int),
 )
-
+TIMEOUT_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.BOX,
+            min=1,
+            max=60,
+            unit_of_measurement="s",
+        )
+    ),
+    vol.Coerce(int),
+)
+QOS_SELECTOR = vol.All(
+    SelectSelector(
+        SelectSelectorConfig(
+            options=["0", "1"], mode=SelectSelectorMode.LIST, translation_key=OPT_QOS
+        )
+    ),
+    vol.Coerce(int),
+)
+DEADBAND_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(mode=NumberSelectorMode.BOX, min=0, max=10, step=0.1)
+    ),
+    vol.Coerce(float),
+)
+DEADBAND_PERCENT_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.BOX,
+            min=0,
+            max=50,
+            step=0.5,
+            unit_of_measurement="%",
+        )
+    ),
+    vol.Coerce(float),
+)
+INTERVAL_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.BOX,
+            min=0,
+            max=3600,
+            unit_of_measurement="s",
+        )
+    ),
+    vol.Coerce(int),
+)
+SAMPLE_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.BOX,
+            min=0,
+            max=100,
+            step=0.1,
+            unit_of_measurement="%",
+        )
+    ),
+    vol.Coerce(float),
+)
+CONTROLLER_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=[CONTROLLER_OFF, CONTROLLER_HYSTERESIS, CONTROLLER_PI],
+        mode=SelectSelectorMode.LIST,
+        translation_key=OPT_CONTROLLER,
+    )
+)
+HUMIDITY_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.SLIDER, min=20, max=80, unit_of_measurement="%"
+        )
+    ),
+    vol.Coerce(int),
+)
+HYSTERESIS_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(
+            mode=NumberSelectorMode.BOX, min=1, max=30, unit_of_measurement="%"
+        )
+    ),
+    vol.Coerce(int),
+)
+GAIN_SELECTOR = vol.All(
+    NumberSelector(
+        NumberSelectorConfig(mode=NumberSelectorMode.BOX, min=0, max=5, step="any")
+    ),
+    vol.Coerce(float),
+)
+STATISTICS_WINDOWS_SELECTOR = SelectSelector(
+    SelectSelectorConfig(
+        options=list(STATISTICS_WINDOWS),
+        multiple=True,
+        mode=SelectSelectorMode.LIST,
+        translation_key=OPT_STATISTICS_WINDOWS,
+    )
+)
+RETRIES_SELECTOR = vol.All(
+    NumberSelector(NumberSelectorConfig(mode=NumberSelectorMode.BOX, min=0, max=5)),
+    vol.Coerce(int),
+)
 
 STEP_USER_DATA_SCHEMA = vol.Schema(
     {
@@ -66,6 +217,9 @@ STEP_USER_DATA_SCHEMA = vol.Schema(
         vol.Optional(CONF_USERNAME): TEXT_SELECTOR,
         vol.Optional(CONF_PASSWORD): PASSWORD_SELECTOR,
         vol.Required(CONF_TOPIC, default=DEFAULT_TOPIC): TEXT_SELECTOR,  # type: ignore
+        vol.Optional(
+            CONF_TRANSPORT, default=DEFAULT_TRANSPORT  # type: ignore
+        ): TRANSPORT_SELECTOR,
     }
 )
 
@@ -132,36 +286,234 @@ class OptionsFlow(config_entries.OptionsFlow):
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage the options."""
+        return self.async_show_menu(
+            step_id="init",
+            menu_options=[
+                "smart",
+                "commands",
+                "sensors",
+                "statistics",
+                "controller",
+                "debug",
+            ],
+        )
+
+    async def async_step_smart(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Параметры режима SMART."""
+        # Запись не загружена, например брокер недоступен: координатора нет.
+        coordinator: Coordinator | None = self.hass.data.get(DOMAIN, {}).get(
+            self.config_entry.entry_id
+        )
         if user_input is not None:
-            coordinator: Coordinator = self.hass.data[DOMAIN][
-                self.config_entry.entry_id
-            ]
-            await coordinator.update_smart_mode(
-                user_input[OPT_EMERG_SHUNT],
-                user_input[OPT_SMART_GATE],
-                user_input[OPT_SMART_SPEED],
+            if coordinator is not None:
+                await coordinator.update_smart_mode(
+                    user_input[OPT_EMERG_SHUNT],
+                    user_input[OPT_SMART_GATE],
+                    user_input[OPT_SMART_SPEED],
+                )
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
             )
-            return self.async_create_entry(title="Параметры обновлены", data=user_input)
 
+        # Показываются значения, прочитанные с устройства, без координатора -
+        # сохранённые в параметрах или значения по умолчанию.
+        settings = (
+            coordinator.smart_settings
+            if coordinator is not None
+            else self.config_entry.options
+        )
         return self.async_show_form(
-            step_id="init",
+            step_id="smart",
             data_schema=vol.Schema(
                 {
                     vol.Required(
-                        OPT_EMERG_SHUNT, default=DEFAULT_SMART_EMERG_SHUNT  # type: ignore
+                        OPT_EMERG_SHUNT,
+                        default=settings.get(
+                            OPT_EMERG_SHUNT, DEFAULT_SMART_EMERG_SHUNT
+                        ),  # type: ignore
                     ): TEMP_SELECTOR,
                     vol.Required(
-                        OPT_SMART_GATE, default=DEFAULT_SMART_GATE  # type: ignore
+                        OPT_SMART_GATE,
+                        default=settings.get(
+                            OPT_SMART_GATE, DEFAULT_SMART_GATE
+                        ),  # type: ignore
                     ): GATE_SELECTOR,
                     vol.Required(
-                        OPT_SMART_SPEED, default=DEFAULT_SMART_SPEED  # type: ignore
+                        OPT_SMART_SPEED,
+                        default=settings.get(
+                            OPT_SMART_SPEED, DEFAULT_SMART_SPEED
+                        ),  # type: ignore
                     ): SPEED_SELECTOR,
                 }
             ),
         )
-        # return await self.async_step_smartauto_options()
 
-    # async def async_step_smartauto_options(self, user_input=None):
+    async def async_step_commands(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Параметры отправки команд."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
+            )
+
+        options = self.config_entry.options
+        return self.async_show_form(
+            step_id="commands",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        OPT_COMMAND_TIMEOUT,
+                        default=options.get(
+                            OPT_COMMAND_TIMEOUT, DEFAULT_COMMAND_TIMEOUT
+                        ),  # type: ignore
+                    ): TIMEOUT_SELECTOR,
+                    vol.Required(
+                        OPT_QOS,
+                        default=str(options.get(OPT_QOS, DEFAULT_QOS)),  # type: ignore
+                    ): QOS_SELECTOR,
+                    vol.Required(
+                        OPT_PUBLISH_RETRIES,
+                        default=options.get(
+                            OPT_PUBLISH_RETRIES, DEFAULT_PUBLISH_RETRIES
+                        ),  # type: ignore
+                    ): RETRIES_SELECTOR,
+                }
+            ),
+        )
+
+    async def async_step_sensors(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Параметры записи показаний датчиков."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
+            )
+
+        options = self.config_entry.options
+        schema: dict[Any, Any] = {}
+        for endpoint in SENSOR_ENDPOINTS:
+            for option, default, selector in (
+                (OPT_DEADBAND, DEFAULT_DEADBAND, DEADBAND_SELECTOR),
+                (
+                    OPT_DEADBAND_PERCENT,
+                    DEFAULT_DEADBAND_PERCENT,
+                    DEADBAND_PERCENT_SELECTOR,
+                ),
+                (
+                    OPT_MIN_WRITE_INTERVAL,
+                    DEFAULT_MIN_WRITE_INTERVAL,
+                    INTERVAL_SELECTOR,
+                ),
+                (
+                    OPT_MAX_WRITE_INTERVAL,
+                    DEFAULT_MAX_WRITE_INTERVAL,
+                    INTERVAL_SELECTOR,
+                ),
+            ):
+                key = f"{endpoint}_{option}"
+                schema[
+                    vol.Required(key, default=options.get(key, default))  # type: ignore
+                ] = selector
+
+        return self.async_show_form(step_id="sensors", data_schema=vol.Schema(schema))
+
+    async def async_step_statistics(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Окна скользящей статистики датчиков."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
+            )
+
+        return self.async_show_form(
+            step_id="statistics",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        OPT_STATISTICS_WINDOWS,
+                        default=self.config_entry.options.get(
+                            OPT_STATISTICS_WINDOWS, []
+                        ),  # type: ignore
+                    ): STATISTICS_WINDOWS_SELECTOR,
+                }
+            ),
+        )
+
+    async def async_step_controller(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Параметры регулятора влажности."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
+            )
+
+        options = self.config_entry.options
+        schema: dict[Any, Any] = {}
+        for option, default, selector in (
+            (OPT_CONTROLLER, DEFAULT_CONTROLLER, CONTROLLER_SELECTOR),
+            (OPT_HUMIDITY_SETPOINT, DEFAULT_HUMIDITY_SETPOINT, HUMIDITY_SELECTOR),
+            (
+                OPT_HUMIDITY_HYSTERESIS,
+                DEFAULT_HUMIDITY_HYSTERESIS,
+                HYSTERESIS_SELECTOR,
+            ),
+            (OPT_CONTROLLER_KP, DEFAULT_CONTROLLER_KP, GAIN_SELECTOR),
+            (OPT_CONTROLLER_KI, DEFAULT_CONTROLLER_KI, GAIN_SELECTOR),
+            (OPT_CONTROLLER_DWELL, DEFAULT_CONTROLLER_DWELL, INTERVAL_SELECTOR),
+            (OPT_CONTROLLER_MIN_TEMP, DEFAULT_SMART_EMERG_SHUNT, TEMP_SELECTOR),
+        ):
+            schema[
+                vol.Required(option, default=options.get(option, default))  # type: ignore
+            ] = selector
+
+        return self.async_show_form(
+            step_id="controller", data_schema=vol.Schema(schema)
+        )
+
+    async def async_step_debug(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Параметры отладки."""
+        if user_input is not None:
+            return self.async_create_entry(
+                title="Параметры обновлены",
+                data={**self.config_entry.options, **user_input},
+            )
+
+        return self.async_show_form(
+            step_id="debug",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        OPT_TRACE,
+                        default=self.config_entry.options.get(OPT_TRACE, False),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        OPT_DIAGNOSTIC_SENSORS,
+                        default=self.config_entry.options.get(
+                            OPT_DIAGNOSTIC_SENSORS, False
+                        ),
+                    ): BooleanSelector(),
+                    vol.Required(
+                        OPT_LATENCY_SAMPLE,
+                        default=self.config_entry.options.get(
+                            OPT_LATENCY_SAMPLE, DEFAULT_LATENCY_SAMPLE
+                        ),
+                    ): SAMPLE_SELECTOR,
+                }
+            ),
+        )
 
 
 class CannotConnect(HomeAssistantError):
@@ -0,0 +1,585 @@
+"""Shared MQTT connections for Vakio devices."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable, Coroutine
+import hashlib
+import logging
+import random
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+import uuid
+
+import paho.mqtt.client as mqtt
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import (
+    ACKED_EARLY_LIMIT,
+    CONF_HOST,
+    CONF_PASSWORD,
+    CONF_PORT,
+    CONF_TRANSPORT,
+    CONF_USERNAME,
+    CONNECTION_TIMEOUT,
+    DATA_CONNECTIONS,
+    DEFAULT_TRANSPORT,
+    READ_PACKET_LIMIT,
+    RECONNECT_MAX_DELAY,
+    RECONNECT_MIN_DELAY,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_THREAD,
+)
+from .metrics import LatencyStats
+
+if TYPE_CHECKING:
+    from .vakio import MqttClient
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+ConnectionKey = tuple[str, int, "str | None", "str | None", str]
+
+
+def connection_key(data: dict[str, Any]) -> ConnectionKey:
+    """Ключ подключения: устройства с одинаковым ключом делят одно соединение.
+
+    Пароль входит в ключ хэшем: записи с одним логином и разными паролями
+    не должны подключаться с учётными данными первой из них.
+    """
+    password = data.get(CONF_PASSWORD)
+    return (
+        data[CONF_HOST],
+        int(data[CONF_PORT]),
+        data.get(CONF_USERNAME) or None,
+        hashlib.sha256(password.encode()).hexdigest() if password else None,
+        data.get(CONF_TRANSPORT, DEFAULT_TRANSPORT),
+    )
+
+
+def backoff_delay(attempt: int) -> float:
+    """Задержка переподключения: экспоненциальный рост со случайным разбросом."""
+    # Степень ограничена: при долгой недоступности счётчик попыток растёт.
+    delay = min(RECONNECT_MAX_DELAY, RECONNECT_MIN_DELAY * 2 ** min(attempt, 32))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class MqttConnection:
+    """Одно подключение к брокеру, общее для всех устройств на нём."""
+
+    def __init__(self, hass: HomeAssistant, data: dict[str, Any]) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.data = data
+        self.key = connection_key(data)
+        self.refs = 0
+
+        self.client_id = f"vakio-openair-{uuid.uuid4().hex[:12]}"
+        self._client = mqtt.Client(client_id=self.client_id)
+        self._client.on_connect = self.on_connect
+        self._client.on_message = self.on_message
+        self._client.on_publish = self.on_publish
+        self._client.on_disconnect = self.on_disconnect
+        # Разброс начальной задержки, чтобы подключения не восстанавливались разом.
+        self._client.reconnect_delay_set(
+            min_delay=backoff_delay(0), max_delay=RECONNECT_MAX_DELAY
+        )
+        if data.get(CONF_USERNAME):
+            self._client.username_pw_set(data[CONF_USERNAME], data.get(CONF_PASSWORD))
+
+        # Топик устройства -> клиент устройства. Словарь читается из потока paho,
+        # поэтому при изменении он заменяется целиком, а не правится на месте.
+        self._clients: dict[str, MqttClient] = {}
+        # Полный топик -> (клиент, конечная точка, декодер) для разбора сообщений.
+        self._routes: dict[str, tuple[MqttClient, str, Callable[[bytes], Any]]] = {}
+        self._paho_lock = asyncio.Lock()  # Prevents parallel calls to the MQTT client
+        self._connect_lock = asyncio.Lock()
+        self.is_started = False
+        self.is_connected = False
+        self.reconnects = 0
+        # Ожидание self._paho_lock и длительность вызовов paho в пуле потоков.
+        self.lock_wait = LatencyStats()
+        self.executor_time = LatencyStats()
+        # Неподтверждённые публикации: mid -> future. Future регистрируется после
+        # вызова publish; подтверждения, пришедшие раньше регистрации, ждут в
+        # self._acked_early. Блокировка не удерживается во время вызовов paho,
+        # иначе она образует взаимную блокировку с мьютексами paho.
+        self._loop = hass.loop
+        self._inflight: dict[int, asyncio.Future[None]] = {}
+        self._acked_early: dict[int, None] = {}
+        self._inflight_lock = threading.Lock()
+
+    def on_connect(self, client, userdata, flags, rc):  # pylint: disable=invalid-name
+        """Реакция на подключение.
+
+        Подписка на топики всех устройств выполняется один раз на подключение.
+        """
+        if rc != mqtt.CONNACK_ACCEPTED:
+            _LOGGER.error("MQTT connection refused: %s", mqtt.connack_string(rc))
+            return
+        self.is_connected = True
+        self._loop.call_soon_threadsafe(self._async_set_connected, True)
+        subscriptions = [
+            subscription
+            for device in self._clients.values()
+            for subscription in device.subscriptions()
+        ]
+        if subscriptions:
+            self._client.subscribe(subscriptions)
+
+    def on_disconnect(self, client, userdata, rc):  # pylint: disable=invalid-name
+        """Реакция на разрыв соединения."""
+        self.is_connected = False
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            self.reconnects += 1
+            _LOGGER.warning(
+                "Connection to MQTT server %s lost: %s",
+                self.data[CONF_HOST],
+                mqtt.error_string(rc),
+            )
+        self._loop.call_soon_threadsafe(self._async_set_connected, False)
+
+    @callback
+    def _async_set_connected(self, connected: bool) -> None:
+        """Передача состояния подключения устройствам."""
+        for device in self._clients.values():
+            device.async_set_connected(connected)
+
+    def on_message(self, client, userdata, message: mqtt.MQTTMessage):
+        """Передача сообщения клиенту устройства по таблице маршрутов.
+
+        Сообщения на неизвестные топики отбрасываются.
+        """
+        route = self._routes.get(message.topic)
+        if route is not None:
+            route[0].dispatch(route[1], route[2], message.payload)
+
+    def on_publish(self, client, userdata, mid):
+        """Подтверждение публикации: PUBACK для QoS 1, отправка для QoS 0."""
+        with self._inflight_lock:
+            future = self._inflight.pop(mid, None)
+            if future is None:
+                self._acked_early[mid] = None
+                # Поздние подтверждения забытых публикаций не должны копиться.
+                if len(self._acked_early) > ACKED_EARLY_LIMIT:
+                    del self._acked_early[next(iter(self._acked_early))]
+        if future is not None:
+            self._loop.call_soon_threadsafe(_resolve, future)
+
+    def _publish(
+        self,
+        topic: str,
+        msg: Any,
+        qos: int,
+        retain: bool,
+        future: asyncio.Future[None],
+    ) -> int:
+        """Публикация с регистрацией ожидания подтверждения, возвращается mid."""
+        info = self._client.publish(topic, msg, qos, retain)
+        with self._inflight_lock:
+            if info.mid in self._acked_early:
+                del self._acked_early[info.mid]
+                self._loop.call_soon_threadsafe(_resolve, future)
+            else:
+                self._inflight[info.mid] = future
+        if info.rc != mqtt.MQTT_ERR_SUCCESS:
+            _LOGGER.debug("Publish to %s queued with rc %s", topic, info.rc)
+        return info.mid
+
+    def forget(self, mid: int) -> None:
+        """Отказ от ожидания подтверждения публикации.
+
+        Для QoS 0 и публикаций без подключения paho может не подтвердить mid.
+        """
+        with self._inflight_lock:
+            self._inflight.pop(mid, None)
+
+    async def _async_paho_call(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Вызов клиента paho в пуле потоков под блокировкой с учётом задержек."""
+        started = time.monotonic()
+        async with self._paho_lock:
+            acquired = time.monotonic()
+            self.lock_wait.add(acquired - started)
+            try:
+                return await self.hass.async_add_executor_job(func, *args)
+            finally:
+                self.executor_time.add(time.monotonic() - acquired)
+
+    def metrics(self) -> dict[str, Any]:
+        """Счётчики подключения для диагностики."""
+        return {
+            "transport": self.key[4],
+            "client_id": self.client_id,
+            "connected": self.is_connected,
+            "devices": len(self._clients),
+            "reconnects": self.reconnects,
+            "inflight": len(self._inflight),
+            "lock_wait": self.lock_wait.as_dict(),
+            "executor_job": self.executor_time.as_dict(),
+        }
+
+    async def connect(self) -> bool:
+        """Connect with the broker.
+
+        Повторный вызов для уже запущенного подключения ничего не делает.
+        """
+        async with self._connect_lock:
+            if self.is_started:
+                return True
+            try:
+                await self.hass.async_add_executor_job(
+                    self._client.connect, self.data[CONF_HOST], self.data[CONF_PORT]
+                )
+            except OSError as err:
+                _LOGGER.error(
+                    "Failed to connect to MQTT server due to exception: %s", err
+                )
+                return False
+            self._client.loop_start()
+            self.is_started = True
+            return True
+
+    async def disconnect(self) -> None:
+        """Disconnect from the broker."""
+
+        def stop() -> None:
+            """Stop the MQTT client."""
+            self._client.disconnect()
+            self._client.loop_stop()
+
+        self.is_connected = False
+        self.is_started = False
+        await self._async_paho_call(stop)
+
+    async def register(self, device: MqttClient) -> None:
+        """Подключение устройства к общему соединению."""
+        self._clients = {**self._clients, device.topic: device}
+        self._routes = {
+            **self._routes,
+            **{
+                topic: (device, endpoint, decoder)
+                for topic, (endpoint, decoder) in device.routes.items()
+            },
+        }
+        if self.is_connected:
+            await self.subscribe(device.subscriptions())
+
+    async def unregister(self, device: MqttClient) -> None:
+        """Отключение устройства от общего соединения."""
+        if self._clients.get(device.topic) is not device:
+            return
+        self._clients = {
+            topic: client
+            for topic, client in self._clients.items()
+            if client is not device
+        }
+        self._routes = {
+            topic: route
+            for topic, route in self._routes.items()
+            if route[0] is not device
+        }
+        if self.is_connected:
+            await self.unsubscribe([topic for topic, _ in device.subscriptions()])
+
+    async def subscribe(self, subscriptions: list[tuple[str, int]]) -> int | None:
+        """Подписка на топики."""
+        _, mid = await self._async_paho_call(self._client.subscribe, subscriptions)
+        return mid
+
+    async def unsubscribe(self, topics: list[str]) -> None:
+        """Отписка от топиков."""
+        await self._async_paho_call(self._client.unsubscribe, topics)
+
+    async def publish(
+        self, topic: str, msg: Any, qos: int, retain: bool
+    ) -> tuple[int, asyncio.Future[None]]:
+        """Publish message to topic.
+
+        Возвращаются mid и future, которое завершается при подтверждении публикации.
+        """
+        future = self._loop.create_future()
+        mid = await self._async_paho_call(
+            self._publish, topic, msg, qos, retain, future
+        )
+        return mid, future
+
+
+class AsyncioMqttConnection(MqttConnection):
+    """Подключение, работающее в цикле событий hass.
+
+    Сокет paho обслуживается через loop.add_reader/add_writer, поэтому
+    публикация и подписка выполняются без пула потоков и без блокировки.
+    В пул потоков выносится только установка TCP-соединения.
+    """
+
+    def __init__(self, hass: HomeAssistant, data: dict[str, Any]) -> None:
+        """Initialize."""
+        super().__init__(hass, data)
+        self._loop_thread_id = threading.get_ident()
+        self._fileno: int | None = None
+        self._misc_task: asyncio.Task | None = None
+        self._reconnect_task: asyncio.Task | None = None
+        # Число попыток переподключения, сбрасывается только принятым CONNACK.
+        self._reconnect_attempt = 0
+        # Ожидание ответа брокера на переподключение.
+        self._connack: asyncio.Future[None] | None = None
+        self._client.on_socket_open = self._on_socket_open
+        self._client.on_socket_close = self._on_socket_close
+        self._client.on_socket_register_write = self._on_socket_register_write
+        self._client.on_socket_unregister_write = self._on_socket_unregister_write
+
+    def on_connect(self, client, userdata, flags, rc):  # pylint: disable=invalid-name
+        """Реакция на подключение, принятое подключение сбрасывает задержку."""
+        if rc == mqtt.CONNACK_ACCEPTED:
+            self._reconnect_attempt = 0
+        super().on_connect(client, userdata, flags, rc)
+
+    def _call_in_loop(self, func: Callable[[int], None], fileno: int) -> None:
+        """Вызов в цикле событий.
+
+        В цикле событий вызов выполняется сразу, пока сокет ещё открыт,
+        из пула потоков (при подключении) передаётся в цикл.
+        """
+        if threading.get_ident() == self._loop_thread_id:
+            func(fileno)
+        else:
+            self._loop.call_soon_threadsafe(func, fileno)
+
+    def _on_socket_open(self, client, userdata, sock) -> None:
+        """Сокет открыт, вызывается в том числе из пула потоков при подключении."""
+        self._call_in_loop(self._async_socket_open, sock.fileno())
+
+    def _on_socket_close(self, client, userdata, sock) -> None:
+        """Сокет закрывается."""
+        self._call_in_loop(self._async_socket_close, sock.fileno())
+
+    def _on_socket_register_write(self, client, userdata, sock) -> None:
+        """Есть данные для отправки."""
+        self._call_in_loop(self._async_writer_add, sock.fileno())
+
+    def _on_socket_unregister_write(self, client, userdata, sock) -> None:
+        """Все данные отправлены."""
+        self._call_in_loop(self._async_writer_remove, sock.fileno())
+
+    @callback
+    def _async_socket_open(self, fileno: int) -> None:
+        """Начало обслуживания сокета в цикле событий."""
+        self._fileno = fileno
+        self._loop.add_reader(fileno, self._read)
+        if not self.is_started:
+            # Подключение из пула потоков завершилось уже после disconnect,
+            # например переподключение во время выгрузки: сокет закрывается.
+            self._client.disconnect()
+            return
+        if self._misc_task is None or self._misc_task.done():
+            self._misc_task = self.hass.async_create_background_task(
+                self._async_misc_loop(), f"{self.client_id} keepalive"
+            )
+
+    def _read(self) -> None:
+        """Чтение пакетов, пока в сокете есть данные, до READ_PACKET_LIMIT.
+
+        loop_read paho 1.6.1 читает не больше пакетов, чем сообщений в его
+        очередях, для входящих QoS 0 - один. Без дочитывания каждое сообщение
+        обрабатывалось бы в своей итерации цикла и отдельным пакетом координатора.
+        """
+        client = self._client
+        for _ in range(READ_PACKET_LIMIT):
+            if client.loop_read() != mqtt.MQTT_ERR_SUCCESS:
+                return
+            sock = client.socket()
+            if sock is None:
+                return
+            try:
+                sock.recv(1, socket.MSG_PEEK)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                # Ошибку сокета обработает следующий loop_read.
+                return
+
+    @callback
+    def _async_socket_close(self, fileno: int) -> None:
+        """Завершение обслуживания сокета."""
+        self.is_connected = False
+        self._loop.remove_reader(fileno)
+        self._loop.remove_writer(fileno)
+        if self._fileno == fileno:
+            self._fileno = None
+        if self._misc_task is not None:
+            self._misc_task.cancel()
+            self._misc_task = None
+
+    @callback
+    def _async_writer_add(self, fileno: int) -> None:
+        """Ожидание готовности сокета к записи."""
+        if self._fileno == fileno:
+            self._loop.add_writer(fileno, self._client.loop_write)
+
+    @callback
+    def _async_writer_remove(self, fileno: int) -> None:
+        """Отмена ожидания готовности к записи."""
+        self._loop.remove_writer(fileno)
+
+    @callback
+    def _async_set_connected(self, connected: bool) -> None:
+        """Передача состояния подключения и запуск переподключения при разрыве."""
+        super()._async_set_connected(connected)
+        if self._connack is not None and not self._connack.done():
+            self._connack.set_result(None)
+        if connected or not self.is_started:
+            return
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = self.hass.async_create_background_task(
+                self._async_reconnect(), f"{self.client_id} reconnect"
+            )
+
+    async def _async_reconnect(self) -> None:
+        """Переподключение к брокеру с экспоненциальной задержкой и разбросом.
+
+        Брокер может принять TCP-соединение и отказать в подключении (неверные
+        учётные данные, брокер ещё запускается), поэтому после reconnect
+        ожидается его ответ, и при отказе попытки продолжаются с растущей
+        задержкой.
+        """
+        while self.is_started and not self.is_connected:
+            await asyncio.sleep(backoff_delay(self._reconnect_attempt))
+            if not self.is_started:
+                return
+            self._reconnect_attempt += 1
+            try:
+                await self.hass.async_add_executor_job(self._client.reconnect)
+            except OSError as err:
+                _LOGGER.debug(
+                    "Reconnect attempt %s failed: %s", self._reconnect_attempt, err
+                )
+                continue
+            self._connack = self._loop.create_future()
+            try:
+                await asyncio.wait_for(self._connack, CONNECTION_TIMEOUT)
+            except TimeoutError:
+                pass
+            finally:
+                self._connack = None
+
+    async def _async_misc_loop(self) -> None:
+        """Поддержание keepalive соединения."""
+        while True:
+            await asyncio.sleep(1)
+            self._client.loop_misc()
+
+    async def connect(self) -> bool:
+        """Connect with the broker."""
+        async with self._connect_lock:
+            if self.is_started:
+                return True
+            # Флаг ставится до подключения: сокет открывается в пуле потоков
+            # раньше, чем connect возвращает управление.
+            self.is_started = True
+            try:
+                await self.hass.async_add_executor_job(
+                    self._client.connect, self.data[CONF_HOST], self.data[CONF_PORT]
+                )
+            except OSError as err:
+                self.is_started = False
+                _LOGGER.error(
+                    "Failed to connect to MQTT server due to exception: %s", err
+                )
+                return False
+            return self.is_started
+
+    async def disconnect(self) -> None:
+        """Disconnect from the broker."""
+        self.is_connected = False
+        self.is_started = False
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        self._client.disconnect()
+
+    async def subscribe(self, subscriptions: list[tuple[str, int]]) -> int | None:
+        """Подписка на топики."""
+        _, mid = self._client.subscribe(subscriptions)
+        return mid
+
+    async def unsubscribe(self, topics: list[str]) -> None:
+        """Отписка от топиков."""
+        self._client.unsubscribe(topics)
+
+    async def publish(
+        self, topic: str, msg: Any, qos: int, retain: bool
+    ) -> tuple[int, asyncio.Future[None]]:
+        """Publish message to topic.
+
+        Возвращаются mid и future, которое завершается при подтверждении публикации.
+        """
+        future = self._loop.create_future()
+        return self._publish(topic, msg, qos, retain, future), future
+
+
+def _resolve(future: asyncio.Future[None]) -> None:
+    """Завершение ожидания публикации, если его ещё не отменили."""
+    if not future.done():
+        future.set_result(None)
+
+
+TRANSPORTS: dict[str, type[MqttConnection]] = {
+    TRANSPORT_ASYNCIO: AsyncioMqttConnection,
+    TRANSPORT_THREAD: MqttConnection,
+}
+
+
+class MqttConnectionPool:
+    """Пул подключений к брокерам с подсчётом ссылок."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self.hass = hass
+        self._connections: dict[ConnectionKey, MqttConnection] = {}
+        # Выполняющиеся проверки брокеров, общие для записей с одним ключом.
+        self._probes: dict[ConnectionKey, asyncio.Task[bool]] = {}
+
+    def get(self, data: dict[str, Any]) -> MqttConnection | None:
+        """Существующее подключение для параметров брокера."""
+        return self._connections.get(connection_key(data))
+
+    async def async_probe(
+        self, data: dict[str, Any], probe: Callable[[], Coroutine[Any, Any, bool]]
+    ) -> bool:
+        """Проверка брокера, одновременные вызовы ждут одну проверку."""
+        key = connection_key(data)
+        task = self._probes.get(key)
+        if task is None:
+            task = self.hass.async_create_task(probe())
+            self._probes[key] = task
+            task.add_done_callback(lambda _: self._probes.pop(key, None))
+        # Отмена одного ожидающего не должна прерывать проверку для остальных.
+        return await asyncio.shield(task)
+
+    def acquire(self, data: dict[str, Any]) -> MqttConnection:
+        """Получение подключения к брокеру, при необходимости создаётся новое."""
+        key = connection_key(data)
+        connection = self._connections.get(key)
+        if connection is None:
+            connection = TRANSPORTS[key[4]](self.hass, data)
+            self._connections[key] = connection
+        connection.refs += 1
+        return connection
+
+    async def release(self, connection: MqttConnection) -> None:
+        """Освобождение подключения, последнее освобождение закрывает его."""
+        connection.refs -= 1
+        if connection.refs > 0:
+            return
+        if self._connections.get(connection.key) is connection:
+            del self._connections[connection.key]
+        await connection.disconnect()
+
+
+def get_pool(hass: HomeAssistant) -> MqttConnectionPool:
+    """Пул подключений интеграции."""
+    pool: MqttConnectionPool | None = hass.data.get(DATA_CONNECTIONS)
+    if pool is None:
+        pool = hass.data[DATA_CONNECTIONS] = MqttConnectionPool(hass)
+    return pool
@@ -4,18 +4,61 @@ import datetime
 from homeassistant.const import Platform
 
 DOMAIN = "vakio_openair"
+DATA_CONNECTIONS = f"{DOMAIN}_connections"
+DATA_STATE_CACHE = f"{DOMAIN}_state_cache"
+
+# Services
+SERVICE_APPLY = "apply"
+
+# Storage
+STORAGE_KEY = f"{DOMAIN}.state"
+STORAGE_VERSION = 1
+# Задержка записи снимков состояния на диск, секунды.
+STORAGE_SAVE_DELAY = 10
+
+# Trace
+TRACE_DIR = f"{DOMAIN}_trace"
+TRACE_FLUSH_INTERVAL = datetime.timedelta(seconds=5)
+
+# Diagnostics
+# Период опроса диагностических датчиков.
+DIAGNOSTIC_SCAN_INTERVAL = datetime.timedelta(seconds=60)
 
 # Platform
 # PLATFORMS = [Platform.SENSOR, Platform.FAN]
 PLATFORMS = [Platform.FAN, Platform.SENSOR]
 
+# MQTT transports
+TRANSPORT_ASYNCIO = "asyncio"
+TRANSPORT_THREAD = "thread"
+
+# Humidity controller modes
+CONTROLLER_OFF = "off"
+CONTROLLER_HYSTERESIS = "hysteresis"
+CONTROLLER_PI = "pi"
+
 # Default consts.
 DEFAULT_PORT = 1883
 DEFAULT_TOPIC = "vakio"
-DEFAULT_TIMEINTERVAL = datetime.timedelta(seconds=5)
+DEFAULT_TRANSPORT = TRANSPORT_ASYNCIO
 DEFAULT_SMART_GATE = 4
 DEFAULT_SMART_SPEED = 5
 DEFAULT_SMART_EMERG_SHUNT = 10
+DEFAULT_COMMAND_TIMEOUT = 5
+DEFAULT_QOS = 1
+DEFAULT_PUBLISH_RETRIES = 2
+DEFAULT_DEADBAND = 0
+DEFAULT_DEADBAND_PERCENT = 0
+DEFAULT_MIN_WRITE_INTERVAL = 0
+DEFAULT_MAX_WRITE_INTERVAL = 0
+DEFAULT_CONTROLLER = CONTROLLER_OFF
+DEFAULT_HUMIDITY_SETPOINT = 50
+DEFAULT_HUMIDITY_HYSTERESIS = 6
+DEFAULT_CONTROLLER_KP = 0.2
+DEFAULT_CONTROLLER_KI = 0.001
+DEFAULT_CONTROLLER_DWELL = 120
+# Доля трассируемых сообщений и команд, проценты; 0 - трассировка выключена.
+DEFAULT_LATENCY_SAMPLE = 0
 
 # CONF consts.
 CONF_HOST = "host"
@@ -23,6 +66,7 @@ CONF_PORT = "port"
 CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 CONF_TOPIC = "topic"
+CONF_TRANSPORT = "transport"
 
 # OPT consts
 OPT_EMERG_SHUNT = "emerg_shunt"
@@ -30,13 +74,51 @@ OPT_SMART_SPEED = "smart_speed"
 OPT_SMART_GATE = "gate"
 OPT_SMART_TOPIC_PREFIX = "server"
 OPT_SMART_TOPIC_ENDPOINT = "openair/mode"
+OPT_COMMAND_TIMEOUT = "command_timeout"
+OPT_QOS = "qos"
+OPT_PUBLISH_RETRIES = "publish_retries"
+# Параметры записи датчиков, ключ опции: "<датчик>_<параметр>", например temp_deadband.
+OPT_DEADBAND = "deadband"
+OPT_DEADBAND_PERCENT = "deadband_percent"
+OPT_MIN_WRITE_INTERVAL = "min_write_interval"
+OPT_MAX_WRITE_INTERVAL = "max_write_interval"
+OPT_STATISTICS_WINDOWS = "statistics_windows"
+OPT_CONTROLLER = "controller"
+OPT_HUMIDITY_SETPOINT = "humidity_setpoint"
+OPT_HUMIDITY_HYSTERESIS = "humidity_hysteresis"
+OPT_CONTROLLER_KP = "controller_kp"
+OPT_CONTROLLER_KI = "controller_ki"
+OPT_CONTROLLER_DWELL = "controller_dwell"
+OPT_CONTROLLER_MIN_TEMP = "controller_min_temp"
+OPT_TRACE = "trace"
+OPT_DIAGNOSTIC_SENSORS = "diagnostic_sensors"
+OPT_LATENCY_SAMPLE = "latency_sample"
+
+# Окна скользящей статистики датчиков, секунды.
+STATISTICS_WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
 
 
 # Errors.
 ERROR_AUTH: str = "ошибка аутентификации"
 ERROR_CONFIG_NO_TREADY: str = "конфигурация интеграции не готова"
+ERROR_BROKER_DISCONNECTED: str = "нет подключения к брокеру"
+ERROR_CONNECTING: str = "выполняется подключение к брокеру"
 
+# Предельное время проверки подключения к брокеру, секунды.
 CONNECTION_TIMEOUT = 5
+# Пределы задержки переподключения к брокеру, секунды.
+RECONNECT_MIN_DELAY = 1
+RECONNECT_MAX_DELAY = 60
+# Время накопления команд перед отправкой, секунды.
+COMMAND_COOLDOWN = 0.2
+# Время ожидания подтверждения публикации, секунды.
+PUBLISH_ACK_TIMEOUT = 3
+# Сколько ждать возврата собственной команды от брокера, секунды.
+ECHO_TIMEOUT = 3
+# Сколько подтверждений, пришедших раньше регистрации публикации, хранится.
+ACKED_EARLY_LIMIT = 256
+# Сколько пакетов читается из сокета за одну итерацию цикла событий.
+READ_PACKET_LIMIT = 500
 
 # Open Air
 OPENAIR_STATE_ON = "on"
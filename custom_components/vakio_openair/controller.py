@@ -0,0 +1,100 @@
+"""Local humidity controller of the Vakio Openair integration."""
+from __future__ import annotations
+
+from .const import CONTROLLER_PI, OPENAIR_SPEED_01, OPENAIR_SPEED_LIST
+
+
+class HumidityController:
+    """Регулятор скорости вентиляции по влажности.
+
+    В режиме гистерезиса скорость переключается между минимальной и
+    максимальной при выходе влажности за границы setpoint ± hysteresis / 2.
+    В режиме PI скорость пропорциональна отклонению влажности и его интегралу.
+    Выход меняется не чаще чем раз в dwell секунд, при температуре ниже
+    min_temp скорость ограничивается минимальной.
+    """
+
+    __slots__ = (
+        "mode",
+        "setpoint",
+        "hysteresis",
+        "kp",
+        "ki",
+        "dwell",
+        "min_temp",
+        "temperature",
+        "integral",
+        "output",
+        "last_sample",
+        "last_change",
+    )
+
+    def __init__(
+        self,
+        mode: str,
+        setpoint: float,
+        hysteresis: float,
+        kp: float,
+        ki: float,
+        dwell: float,
+        min_temp: float,
+    ) -> None:
+        """Initialize."""
+        self.mode = mode
+        self.setpoint = setpoint
+        self.hysteresis = hysteresis
+        self.kp = kp
+        self.ki = ki
+        self.dwell = dwell
+        self.min_temp = min_temp
+        self.temperature: float | None = None
+        self.integral = 0.0
+        self.output: int | None = None
+        self.last_sample: float | None = None
+        self.last_change: float | None = None
+
+    def reset(self) -> None:
+        """Сброс состояния, когда регулятор не управляет устройством."""
+        self.integral = 0.0
+        self.output = None
+        self.last_sample = None
+
+    def evaluate(self, humidity: float, now: float) -> int | None:
+        """Расчёт скорости по новому показанию влажности.
+
+        Возвращается новая скорость или None, если её менять не нужно.
+        """
+        if self.mode == CONTROLLER_PI:
+            target = self._pi(humidity, now)
+        else:
+            target = self._hysteresis(humidity)
+        self.last_sample = now
+        if self.temperature is not None and self.temperature < self.min_temp:
+            target = OPENAIR_SPEED_01
+        if target is None or target == self.output:
+            return None
+        if self.last_change is not None and now - self.last_change < self.dwell:
+            return None
+        self.output = target
+        self.last_change = now
+        return target
+
+    def _hysteresis(self, humidity: float) -> int | None:
+        """Двухпозиционное регулирование."""
+        if humidity >= self.setpoint + self.hysteresis / 2:
+            return OPENAIR_SPEED_LIST[-1]
+        if humidity <= self.setpoint - self.hysteresis / 2:
+            return OPENAIR_SPEED_01
+        return self.output
+
+    def _pi(self, humidity: float, now: float) -> int:
+        """Пропорционально-интегральное регулирование."""
+        error = humidity - self.setpoint
+        if self.last_sample is not None:
+            self.integral += error * (now - self.last_sample)
+        # Интеграл ограничивается диапазоном скоростей, чтобы не накапливался.
+        if self.ki:
+            limit = (OPENAIR_SPEED_LIST[-1] - OPENAIR_SPEED_01) / self.ki
+            self.integral = max(-limit, min(limit, self.integral))
+        value = OPENAIR_SPEED_01 + self.kp * error + self.ki * self.integral
+        return int(max(OPENAIR_SPEED_01, min(OPENAIR_SPEED_LIST[-1], round(value))))
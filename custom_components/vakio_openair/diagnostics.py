@@ -0,0 +1,26 @@
+"""Diagnostics support for Vakio Openair."""
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PASSWORD, CONF_USERNAME, DOMAIN
+from .vakio import Coordinator
+
+TO_REDACT = {CONF_PASSWORD, CONF_USERNAME}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Параметры записи, состояние устройства и счётчики."""
+    coordinator: Coordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        "state": coordinator.condition.as_dict(),
+        "smart_settings": coordinator.smart_settings,
+        "metrics": coordinator.metrics(),
+    }
@@ -1,15 +1,13 @@
 """Fan platform."""
 from __future__ import annotations
 
-from datetime import UTC, datetime, timedelta
 import decimal
 from typing import Any
 
 from homeassistant.components.fan import FanEntity, FanEntityFeature
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 from homeassistant.util.percentage import (
     ordered_list_item_to_percentage,
@@ -26,7 +24,7 @@ from .const import (
     OPENAIR_WORKMODE_MANUAL,
     OPENAIR_WORKMODE_SUPERAUTO,
 )
-from .vakio import Coordinator
+from .vakio import FAN_ENDPOINTS, VakioEntity
 
 percentage = ordered_list_item_to_percentage(OPENAIR_SPEED_LIST, OPENAIR_SPEED_01)
 named_speed = percentage_to_ordered_list_item(OPENAIR_SPEED_LIST, 20)
@@ -79,25 +77,11 @@ async def async_setup_platform(
         hass, topic, "OpenAir", conf.entry_id, LIMITED_SUPPORT, PRESET_MODS  # type: ignore
     )
     entities([openair])
-    coordinator: Coordinator = hass.data[DOMAIN][conf.entry_id]  # type: ignore
-    await coordinator.async_login()
-    async_track_time_interval(
-        hass,
-        coordinator._async_update,  # pylint: disable=protected-access
-        timedelta(seconds=1),
-    )
-    async_track_time_interval(
-        hass,
-        openair._async_update,  # pylint: disable=protected-access
-        timedelta(seconds=1),
-    )
 
 
-class VakioOpenAirFanBase(FanEntity):
+class VakioOpenAirFanBase(VakioEntity, FanEntity):
     """Base class for VakioOperAirFan."""
 
-    _attr_should_poll = False
-
     def __init__(
         self,
         hass: HomeAssistant,
@@ -109,6 +93,7 @@ class VakioOpenAirFanBase(FanEntity):
         translation_key: str | None = None,
     ) -> None:
         """Функция иниципализации."""
+        super().__init__(hass.data[DOMAIN][entry_id], FAN_ENDPOINTS)
         self.hass = hass
         self._unique_id = unique_id
         self._attr_supported_features = supported_features
@@ -124,7 +109,6 @@ class VakioOpenAirFanBase(FanEntity):
         if supported_features & FanEntityFeature.DIRECTION:
             self._direction = None
         self._attr_translation_key = translation_key
-        self.coordinator: Coordinator = hass.data[DOMAIN][entry_id]
 
     @property
     def unique_id(self) -> str:
@@ -172,10 +156,11 @@ class VakioOpenAirFan(VakioOpenAirFanBase, FanEntity):
         current_workmode = self.coordinator.get_workmode()
 
         if current_workmode == OPENAIR_WORKMODE_SUPERAUTO:
-            self._percentage = self.coordinator.get_speed()
+            # В режиме SUPER AUTO скоростью управляет устройство.
+            self.update_speed()
             return self.async_write_ha_state()
 
-        self._percentage = percentage
+        # Состояние обновляется координатором сразу после постановки команды.
         if percentage == 0:
             await self.coordinator.speed(0)
             return self.update_all_options()
@@ -231,15 +216,29 @@ class VakioOpenAirFan(VakioOpenAirFanBase, FanEntity):
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Выключение устройства."""
         await self.coordinator.turn_off()
-        await self._async_update(datetime.now(UTC))
+        self.update_state()
         self.schedule_update_ha_state()
 
-    async def _async_update(self, now: datetime) -> None:
-        """Async Update.
+    async def async_added_to_hass(self) -> None:
+        """Подписка на обновления координатора."""
+        await super().async_added_to_hass()
+        self.update_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle Coordinator Update.
+
+        Функция вызывается координатором при получении новых данных от брокера.
+        """
+        if self.update_state() or self.coordinator.dirty is None:
+            self.async_write_ha_state()
+
+    def update_state(self) -> bool:
+        """Update State.
 
-        Функция вызывается по таймеру.
         Выполняется сравнение параметров состояния устройства с параметрами записанными в классе.
         Если выявляется разница, тогда параметры класса обновляются.
+        Возвращается "истина" если было выполнено обновление.
         """
         is_update: bool = False
         if self.update_speed():
@@ -248,8 +247,7 @@ class VakioOpenAirFan(VakioOpenAirFanBase, FanEntity):
             is_update = True
         if self.update_on_off():
             is_update = True
-        if is_update:
-            self.update_all_options()
+        return is_update
 
     def update_speed(self) -> bool:
         """Update Speed.
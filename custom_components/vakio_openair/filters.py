@@ -0,0 +1,82 @@
+"""Write filters for the Vakio Openair sensors."""
+from __future__ import annotations
+
+
+class WriteFilter:
+    """Отбор значений датчика для записи в состояние.
+
+    Значение записывается, если оно вышло за зону нечувствительности и с
+    прошлой записи прошло не меньше min_interval секунд. Не прошедшее по
+    времени значение записывается позже, а значение внутри зоны записывается
+    не реже чем раз в max_interval секунд. Нулевые параметры отключены.
+    """
+
+    __slots__ = (
+        "deadband",
+        "deadband_percent",
+        "min_interval",
+        "max_interval",
+        "last_write",
+        "pending",
+    )
+
+    def __init__(
+        self,
+        deadband: float = 0,
+        deadband_percent: float = 0,
+        min_interval: float = 0,
+        max_interval: float = 0,
+    ) -> None:
+        """Initialize."""
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.last_write: float | None = None
+        self.pending: float | None = None
+
+    def is_significant(self, value: float, current: float | None) -> bool:
+        """Вышло ли значение за зону нечувствительности."""
+        if current is None:
+            return True
+        delta = abs(value - current)
+        if not self.deadband and not self.deadband_percent:
+            return delta > 0
+        if self.deadband and delta >= self.deadband:
+            return True
+        return bool(
+            self.deadband_percent
+            and delta >= abs(current) * self.deadband_percent / 100
+        )
+
+    def evaluate(self, value: float, current: float | None, now: float) -> float | None:
+        """Решение по новому значению.
+
+        Возвращается 0, если значение записывается сразу, задержка до отложенной
+        записи или None, если значение отбрасывается.
+        """
+        elapsed = None if self.last_write is None else now - self.last_write
+        if not self.is_significant(value, current):
+            self.pending = None
+            if (
+                self.max_interval
+                and elapsed is not None
+                and elapsed >= self.max_interval
+                and value != current
+            ):
+                self.last_write = now
+                return 0
+            return None
+        if elapsed is not None and elapsed < self.min_interval:
+            self.pending = value
+            return self.min_interval - elapsed
+        self.pending = None
+        self.last_write = now
+        return 0
+
+    def flush(self, now: float) -> float | None:
+        """Отложенное значение для записи."""
+        value, self.pending = self.pending, None
+        if value is not None:
+            self.last_write = now
+        return value
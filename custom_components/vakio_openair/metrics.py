@@ -0,0 +1,53 @@
+"""Runtime metrics of the Vakio Openair integration."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from typing import Any
+
+# Верхние границы корзин гистограммы задержек, секунды.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class LatencyStats:
+    """Накопительная статистика задержек с фиксированной гистограммой."""
+
+    __slots__ = ("count", "total", "min", "max", "last", "buckets")
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.count = 0
+        self.total = 0.0
+        self.min: float | None = None
+        self.max: float | None = None
+        self.last: float | None = None
+        # Последняя корзина собирает значения больше LATENCY_BUCKETS[-1].
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, value: float) -> None:
+        """Учёт одного измерения."""
+        self.count += 1
+        self.total += value
+        self.last = value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.buckets[bisect_left(LATENCY_BUCKETS, value)] += 1
+
+    @property
+    def mean(self) -> float | None:
+        """Средняя задержка."""
+        return self.total / self.count if self.count else None
+
+    def as_dict(self) -> dict[str, Any]:
+        """Представление для диагностики."""
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "last": self.last,
+            "buckets": dict(
+                zip([*map(str, LATENCY_BUCKETS), "inf"], self.buckets, strict=True)
+            ),
+        }
@@ -0,0 +1,131 @@
+"""Rolling statistics of the Vakio Openair sensors."""
+from __future__ import annotations
+
+from typing import Any
+
+# Число корзин кольцевого буфера на окно.
+ROLLING_BUCKETS = 60
+
+STAT_MIN = "min"
+STAT_MAX = "max"
+STAT_MEAN = "mean"
+STAT_RATE = "rate"
+STATISTICS = (STAT_MIN, STAT_MAX, STAT_MEAN, STAT_RATE)
+# Знаков после запятой в значениях статистики.
+STAT_PRECISION = 2
+
+
+class RollingWindow:
+    """Скользящее окно показаний в кольцевом буфере корзин.
+
+    Окно делится на ROLLING_BUCKETS корзин одинаковой ширины, каждая хранит
+    агрегаты своих показаний. Добавление выполняется за O(1), память
+    ограничена числом корзин, точность границы окна - ширина корзины.
+    Статистика пересчитывается в refresh не чаще раза в ширину корзины и
+    хранится в values.
+    """
+
+    __slots__ = (
+        "window",
+        "width",
+        "_starts",
+        "_count",
+        "_total",
+        "_min",
+        "_max",
+        "_first",
+        "_first_time",
+        "_last",
+        "_last_time",
+        "_due",
+        "values",
+    )
+
+    def __init__(self, window: float, buckets: int = ROLLING_BUCKETS) -> None:
+        """Initialize."""
+        self.window = window
+        self.width = window / buckets
+        self._starts: list[float | None] = [None] * buckets
+        self._count = [0] * buckets
+        self._total = [0.0] * buckets
+        self._min = [0.0] * buckets
+        self._max = [0.0] * buckets
+        self._first = [0.0] * buckets
+        self._first_time = [0.0] * buckets
+        self._last = [0.0] * buckets
+        self._last_time = [0.0] * buckets
+        self._due = float("-inf")
+        self.values: dict[str, float | None] = dict.fromkeys(STATISTICS)
+
+    def add(self, value: float, now: float) -> None:
+        """Добавление показания."""
+        slot = int(now // self.width)
+        index = slot % len(self._starts)
+        start = slot * self.width
+        if self._starts[index] != start:
+            # Корзина устарела: начинается заново с текущего показания.
+            self._starts[index] = start
+            self._count[index] = 1
+            self._total[index] = value
+            self._min[index] = self._max[index] = value
+            self._first[index] = self._last[index] = value
+            self._first_time[index] = self._last_time[index] = now
+            return
+        self._count[index] += 1
+        self._total[index] += value
+        if value < self._min[index]:
+            self._min[index] = value
+        if value > self._max[index]:
+            self._max[index] = value
+        self._last[index] = value
+        self._last_time[index] = now
+
+    def stats(self, now: float) -> dict[str, Any]:
+        """Минимум, максимум, среднее и скорость изменения в единицах в час."""
+        oldest = newest = None
+        count = 0
+        total = 0.0
+        minimum = maximum = None
+        since = now - self.window
+        for index, start in enumerate(self._starts):
+            if start is None or start + self.width <= since:
+                continue
+            count += self._count[index]
+            total += self._total[index]
+            if minimum is None or self._min[index] < minimum:
+                minimum = self._min[index]
+            if maximum is None or self._max[index] > maximum:
+                maximum = self._max[index]
+            if oldest is None or start < self._starts[oldest]:  # type: ignore
+                oldest = index
+            if newest is None or start > self._starts[newest]:  # type: ignore
+                newest = index
+
+        rate = None
+        if oldest is not None and newest is not None:
+            elapsed = self._last_time[newest] - self._first_time[oldest]
+            if elapsed > 0:
+                rate = (self._last[newest] - self._first[oldest]) / elapsed * 3600
+        return {
+            STAT_MIN: minimum,
+            STAT_MAX: maximum,
+            STAT_MEAN: total / count if count else None,
+            STAT_RATE: rate,
+        }
+
+    def refresh(self, now: float) -> bool:
+        """Пересчёт values, если с прошлого прошла ширина корзины.
+
+        Возвращается "истина", если округлённые значения изменились.
+        """
+        if now < self._due:
+            return False
+        self._due = now + self.width
+        values = {
+            stat: None if value is None else round(value, STAT_PRECISION)
+            for stat, value in self.stats(now).items()
+        }
+        if values == self.values:
+            return False
+        self.values = values
+        return True
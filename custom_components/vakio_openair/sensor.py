@@ -1,7 +1,9 @@
 """Sensor platform that has a temperature and humidity sensors."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
 
 from homeassistant.components.sensor import (
     SensorDeviceClass,
@@ -9,15 +11,116 @@ from homeassistant.components.sensor import (
     SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import ATTR_BATTERY_LEVEL, PERCENTAGE, UnitOfTemperature
-from homeassistant.core import HomeAssistant
+from homeassistant.const import (
+    ATTR_BATTERY_LEVEL,
+    PERCENTAGE,
+    EntityCategory,
+    UnitOfTemperature,
+    UnitOfTime,
+)
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.entity import DeviceInfo
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
-from homeassistant.helpers.event import async_track_time_interval
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType, StateType
+from homeassistant.util import dt as dt_util
 
 from . import DOMAIN
-from .vakio import Coordinator
+from .const import DIAGNOSTIC_SCAN_INTERVAL, OPT_DIAGNOSTIC_SENSORS
+from .rolling import STAT_RATE, STATISTICS
+from .vakio import (
+    HUD_ENDPOINT,
+    TEMP_ENDPOINT,
+    Coordinator,
+    VakioEntity,
+    statistics_key,
+)
+
+# Опрашиваются только диагностические датчики, остальные обновляет координатор.
+SCAN_INTERVAL = DIAGNOSTIC_SCAN_INTERVAL
+
+
+def _mean_ms(value: float | None) -> float | None:
+    """Секунды в миллисекунды."""
+    return round(value * 1000, 2) if value is not None else None
+
+
+def _last_message(coordinator: Coordinator) -> datetime | None:
+    """Время последнего сообщения от устройства."""
+    received = coordinator.mqttc.last_received
+    if not received:
+        return None
+    return dt_util.utc_from_timestamp(max(received.values()))
+
+
+def _connection_metric(coordinator: Coordinator, name: str) -> Any:
+    """Значение счётчика общего подключения к брокеру."""
+    connection = coordinator.mqttc.metrics()["connection"]
+    return connection[name] if connection is not None else None
+
+
+# Ключ, название, единица, класс устройства, класс состояния, значение.
+DIAGNOSTIC_SENSORS: tuple[
+    tuple[
+        str,
+        str,
+        str | None,
+        SensorDeviceClass | None,
+        SensorStateClass | None,
+        Callable[[Coordinator], Any],
+    ],
+    ...,
+] = (
+    (
+        "messages_received",
+        "Messages received",
+        None,
+        None,
+        SensorStateClass.TOTAL_INCREASING,
+        lambda coordinator: sum(coordinator.mqttc.received.values()),
+    ),
+    (
+        "last_message",
+        "Last message",
+        None,
+        SensorDeviceClass.TIMESTAMP,
+        None,
+        _last_message,
+    ),
+    (
+        "publish_failures",
+        "Publish failures",
+        None,
+        None,
+        SensorStateClass.TOTAL_INCREASING,
+        lambda coordinator: coordinator.mqttc.publish_failures,
+    ),
+    (
+        "ack_latency",
+        "Publish latency",
+        UnitOfTime.MILLISECONDS,
+        SensorDeviceClass.DURATION,
+        SensorStateClass.MEASUREMENT,
+        lambda coordinator: _mean_ms(coordinator.mqttc.ack_latency.mean),
+    ),
+    (
+        "reconnects",
+        "Reconnects",
+        None,
+        None,
+        SensorStateClass.TOTAL_INCREASING,
+        lambda coordinator: _connection_metric(coordinator, "reconnects"),
+    ),
+    (
+        "executor_job",
+        "Executor job time",
+        UnitOfTime.MILLISECONDS,
+        SensorDeviceClass.DURATION,
+        SensorStateClass.MEASUREMENT,
+        lambda coordinator: _mean_ms(
+            (_connection_metric(coordinator, "executor_job") or {}).get("mean")
+        ),
+    ),
+)
 
 
 async def async_setup_platform(
@@ -49,17 +152,37 @@ async def async_setup_platform(
         PERCENTAGE,
     )
     async_add_entities([temp, hud])
-    async_track_time_interval(
-        hass,
-        temp._async_update,  # pylint: disable=protected-access
-        timedelta(seconds=30),
-    )
-    async_track_time_interval(
-        hass,
-        hud._async_update,  # pylint: disable=protected-access
-        timedelta(seconds=30),
+
+    # Скользящая статистика включается в параметрах интеграции.
+    coordinator: Coordinator = hass.data[DOMAIN][conf.entry_id]  # type: ignore
+    async_add_entities(
+        VakioStatisticSensor(
+            coordinator,
+            f"{topic}_{endpoint}",
+            f"{base_name} {stat} {window}",
+            endpoint,
+            window,
+            stat,
+            unit,
+        )
+        for endpoint, base_name, unit in (
+            (TEMP_ENDPOINT, "OpenAir Temp", UnitOfTemperature.CELSIUS),
+            (HUD_ENDPOINT, "OpenAir Humidity", PERCENTAGE),
+        )
+        for window in coordinator.statistics.get(endpoint, {})
+        for stat in STATISTICS
     )
 
+    # Диагностические датчики включаются в параметрах интеграции.
+    if conf.options.get(OPT_DIAGNOSTIC_SENSORS):  # type: ignore
+        async_add_entities(
+            (
+                VakioDiagnosticSensor(coordinator, topic, *description)
+                for description in DIAGNOSTIC_SENSORS
+            ),
+            True,
+        )
+
 
 async def async_setup_entry(
     hass: HomeAssistant,
@@ -70,11 +193,9 @@ async def async_setup_entry(
     await async_setup_platform(hass, config_entry, async_add_entities)  # type: ignore
 
 
-class VakioSensor(SensorEntity):
+class VakioSensor(VakioEntity, SensorEntity):
     """Реализация сенсора устройства Vakio."""
 
-    _attr_should_poll = False
-
     def __init__(
         self,
         hass: HomeAssistant,
@@ -90,8 +211,13 @@ class VakioSensor(SensorEntity):
         translation_key: str | None = None,
     ) -> None:
         """Initialize the sensor."""
+        self._endpoint = (
+            TEMP_ENDPOINT
+            if device_class == SensorDeviceClass.TEMPERATURE
+            else HUD_ENDPOINT
+        )
+        super().__init__(hass.data[DOMAIN][entry_id], frozenset({self._endpoint}))
         self.hass = hass
-        self.coordinator: Coordinator = hass.data[DOMAIN][entry_id]
         self._entity_id = entry_id
         self._attr_device_class = device_class
         if name is not None:
@@ -113,11 +239,110 @@ class VakioSensor(SensorEntity):
         if battery:
             self._attr_extra_state_attributes = {ATTR_BATTERY_LEVEL: battery}
 
-    async def _async_update(self, now: datetime) -> None:
-        if self._attr_device_class == SensorDeviceClass.TEMPERATURE:
+    async def async_added_to_hass(self) -> None:
+        """Подписка на обновления координатора."""
+        await super().async_added_to_hass()
+        self.update_value()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Запись состояния при изменении значения датчика или доступности."""
+        if self.update_value() or self.coordinator.dirty is None:
+            self.async_write_ha_state()
+
+    def update_value(self) -> bool:
+        """Обновление значения датчика, возвращается "истина" при изменении."""
+        if self._endpoint == TEMP_ENDPOINT:
             val = self.coordinator.get_temp()
         else:
             val = self.coordinator.get_hud()
 
-        self._attr_native_value = val if val is not None else 20
-        self.async_write_ha_state()
+        if val == self._attr_native_value:
+            return False
+        self._attr_native_value = val
+        return True
+
+
+class VakioStatisticSensor(VakioEntity, SensorEntity):
+    """Скользящая статистика показаний датчика устройства Vakio."""
+
+    _attr_state_class = SensorStateClass.MEASUREMENT
+
+    def __init__(
+        self,
+        coordinator: Coordinator,
+        device_id: str,
+        name: str,
+        endpoint: str,
+        window: str,
+        stat: str,
+        unit_of_measurement: str,
+    ) -> None:
+        """Initialize the sensor."""
+        super().__init__(coordinator, frozenset({statistics_key(endpoint)}))
+        self._rolling = coordinator.statistics[endpoint][window]
+        self._stat = stat
+        self._attr_name = name
+        self._attr_unique_id = f"{device_id}_{stat}_{window}"
+        if stat == STAT_RATE:
+            self._attr_native_unit_of_measurement = f"{unit_of_measurement}/h"
+        else:
+            self._attr_native_unit_of_measurement = unit_of_measurement
+            if endpoint == TEMP_ENDPOINT:
+                self._attr_device_class = SensorDeviceClass.TEMPERATURE
+            else:
+                self._attr_device_class = SensorDeviceClass.HUMIDITY
+        self._attr_device_info = DeviceInfo(identifiers={(DOMAIN, device_id)})
+
+    async def async_added_to_hass(self) -> None:
+        """Подписка на обновления координатора."""
+        await super().async_added_to_hass()
+        self.update_value()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Запись состояния при изменении значения или доступности."""
+        if self.update_value() or self.coordinator.dirty is None:
+            self.async_write_ha_state()
+
+    def update_value(self) -> bool:
+        """Значение статистики, пересчитанной координатором, "истина" при изменении."""
+        value = self._rolling.values[self._stat]
+        if value == self._attr_native_value:
+            return False
+        self._attr_native_value = value
+        return True
+
+
+class VakioDiagnosticSensor(SensorEntity):
+    """Диагностический счётчик устройства Vakio, обновляется опросом."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_should_poll = True
+
+    def __init__(
+        self,
+        coordinator: Coordinator,
+        device_id: str,
+        key: str,
+        name: str,
+        unit_of_measurement: str | None,
+        device_class: SensorDeviceClass | None,
+        state_class: SensorStateClass | None,
+        value: Callable[[Coordinator], Any],
+    ) -> None:
+        """Initialize the sensor."""
+        self._coordinator = coordinator
+        self._value = value
+        self._attr_name = f"OpenAir {name}"
+        self._attr_unique_id = f"{device_id}_{key}"
+        self._attr_native_unit_of_measurement = unit_of_measurement
+        self._attr_device_class = device_class
+        self._attr_state_class = state_class
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, device_id)}, name="OpenAir"
+        )
+
+    async def async_update(self) -> None:
+        """Чтение счётчика."""
+        self._attr_native_value = self._value(self._coordinator)
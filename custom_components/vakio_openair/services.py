@@ -0,0 +1,83 @@
+"""Services of the Vakio Openair integration."""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+import voluptuous as vol
+
+from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.helpers import config_validation as cv
+from homeassistant.helpers.service import async_extract_config_entry_ids
+
+from .const import (
+    DOMAIN,
+    OPENAIR_GATE_LIST,
+    OPENAIR_SPEED_00,
+    OPENAIR_SPEED_LIST,
+    OPENAIR_STATE_OFF,
+    OPENAIR_STATE_ON,
+    OPENAIR_WORKMODE_MANUAL,
+    OPENAIR_WORKMODE_SUPERAUTO,
+    SERVICE_APPLY,
+)
+from .vakio import (
+    GATE_ENDPOINT,
+    SPEED_ENDPOINT,
+    STATE_ENDPOINT,
+    WORKMODE_ENDPOINT,
+    Coordinator,
+)
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+APPLY_FIELDS = {
+    vol.Optional(STATE_ENDPOINT): vol.In([OPENAIR_STATE_ON, OPENAIR_STATE_OFF]),
+    vol.Optional(WORKMODE_ENDPOINT): vol.In(
+        [OPENAIR_WORKMODE_MANUAL, OPENAIR_WORKMODE_SUPERAUTO]
+    ),
+    vol.Optional(SPEED_ENDPOINT): vol.All(
+        vol.Coerce(int), vol.Range(min=OPENAIR_SPEED_00, max=OPENAIR_SPEED_LIST[-1])
+    ),
+    vol.Optional(GATE_ENDPOINT): vol.All(
+        vol.Coerce(int), vol.Range(min=OPENAIR_GATE_LIST[0], max=OPENAIR_GATE_LIST[-1])
+    ),
+}
+APPLY_SCHEMA = vol.All(
+    cv.make_entity_service_schema(APPLY_FIELDS),
+    cv.has_at_least_one_key(*(str(key) for key in APPLY_FIELDS)),
+)
+
+
+def async_setup_services(hass: HomeAssistant) -> None:
+    """Регистрация служб интеграции."""
+
+    async def async_apply(call: ServiceCall) -> None:
+        """Перевод выбранных устройств в заданное состояние.
+
+        Каждому устройству отправляются только отличающиеся значения, все
+        устройства обрабатываются одновременно.
+        """
+        desired = {
+            str(key): call.data[str(key)]
+            for key in APPLY_FIELDS
+            if str(key) in call.data
+        }
+        coordinators: list[Coordinator] = [
+            hass.data[DOMAIN][entry_id]
+            for entry_id in await async_extract_config_entry_ids(hass, call)
+            if entry_id in hass.data.get(DOMAIN, {})
+        ]
+        changed = await asyncio.gather(
+            *(coordinator.async_apply_state(desired) for coordinator in coordinators)
+        )
+        _LOGGER.debug(
+            "Applied %s to %s devices, %s changed",
+            desired,
+            len(coordinators),
+            sum(1 for endpoints in changed if endpoints),
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_APPLY, async_apply, schema=APPLY_SCHEMA
+    )
@@ -0,0 +1,83 @@
+"""Persistent cache of the last known device state."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_STATE_CACHE, STORAGE_KEY, STORAGE_SAVE_DELAY, STORAGE_VERSION
+
+
+class StateCache:
+    """Снимки состояния устройств, общие для всех записей интеграции.
+
+    Снимки записываются на диск отложенно, одной записью на все устройства,
+    не чаще раза в STORAGE_SAVE_DELAY.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize."""
+        self._store: Store[dict[str, dict[str, Any]]] = Store(
+            hass, STORAGE_VERSION, STORAGE_KEY
+        )
+        self._snapshots: dict[str, dict[str, Any]] = {}
+        self._load_lock = asyncio.Lock()
+        self._loaded = False
+        self._save_pending = False
+
+    async def async_load(self) -> None:
+        """Загрузка снимков, выполняется один раз."""
+        async with self._load_lock:
+            if self._loaded:
+                return
+            self._snapshots = await self._store.async_load() or {}
+            self._loaded = True
+
+    def get(self, key: str) -> dict[str, Any]:
+        """Последний сохранённый снимок устройства."""
+        return self._snapshots.get(key, {})
+
+    @callback
+    def async_set(self, key: str, snapshot: dict[str, Any]) -> None:
+        """Обновление снимка устройства с отложенной записью.
+
+        Снимок хранится по ссылке: владелец меняет его на месте и вызывает
+        async_set после изменения, без копирования.
+        """
+        self._snapshots[key] = snapshot
+        self._async_schedule_save()
+
+    @callback
+    def async_remove(self, key: str) -> None:
+        """Удаление снимка устройства."""
+        if self._snapshots.pop(key, None) is not None:
+            self._async_schedule_save()
+
+    @callback
+    def _async_schedule_save(self) -> None:
+        """Планирование записи, если она ещё не запланирована.
+
+        Повторный async_delay_save переносит таймер записи, поэтому при частых
+        изменениях запись откладывалась бы бесконечно. Изменения, пришедшие до
+        записи, попадают в уже запланированную.
+        """
+        if self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    @callback
+    def _data_to_save(self) -> dict[str, dict[str, Any]]:
+        """Данные для записи на диск."""
+        self._save_pending = False
+        return self._snapshots
+
+
+def get_state_cache(hass: HomeAssistant) -> StateCache:
+    """Кэш состояний интеграции."""
+    cache: StateCache | None = hass.data.get(DATA_STATE_CACHE)
+    if cache is None:
+        cache = hass.data[DATA_STATE_CACHE] = StateCache(hass)
+    return cache
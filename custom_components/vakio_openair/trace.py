@@ -0,0 +1,91 @@
+"""MQTT trace recorder of the Vakio Openair integration."""
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Iterator
+from datetime import datetime
+import json
+import os
+import time
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_track_time_interval
+
+from .const import TRACE_FLUSH_INTERVAL
+
+INBOUND = "i"
+OUTBOUND = "o"
+
+
+class TraceRecorder:
+    """Запись входящих и исходящих сообщений устройства.
+
+    Файл только дополняется, одна строка на сообщение:
+    [время, направление, топик, данные]. Записи копятся в памяти и
+    сбрасываются на диск из пула потоков раз в TRACE_FLUSH_INTERVAL.
+    """
+
+    def __init__(self, hass: HomeAssistant, path: str) -> None:
+        """Initialize."""
+        self.hass = hass
+        self.path = path
+        self.records = 0
+        self._buffer: deque[str] = deque()
+        self._unsub: CALLBACK_TYPE | None = None
+
+    def record(self, direction: str, topic: str, payload: bytes | str) -> None:
+        """Запись сообщения, может вызываться из потока paho."""
+        if isinstance(payload, bytes):
+            payload = payload.decode("utf-8", "backslashreplace")
+        self._buffer.append(
+            json.dumps(
+                [round(time.time(), 6), direction, topic, payload],
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        )
+        self.records += 1
+
+    @callback
+    def async_start(self) -> None:
+        """Запуск периодического сброса на диск."""
+        if self._unsub is None:
+            self._unsub = async_track_time_interval(
+                self.hass, self._async_flush_timer, TRACE_FLUSH_INTERVAL
+            )
+
+    async def async_stop(self) -> None:
+        """Остановка записи с сохранением накопленного."""
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+        await self.async_flush()
+
+    async def _async_flush_timer(self, now: datetime) -> None:
+        """Периодический сброс на диск."""
+        await self.async_flush()
+
+    async def async_flush(self) -> None:
+        """Сброс накопленных записей на диск."""
+        lines = []
+        while self._buffer:
+            lines.append(self._buffer.popleft())
+        if lines:
+            await self.hass.async_add_executor_job(self._write, lines)
+
+    def _write(self, lines: list[str]) -> None:
+        """Дозапись строк в файл."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+
+
+def read_trace(path: str) -> Iterator[tuple[float, str, str, str]]:
+    """Чтение записей из файла, повреждённые строки пропускаются."""
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            try:
+                timestamp, direction, topic, payload = json.loads(line)
+            except ValueError:
+                continue
+            yield timestamp, direction, topic, payload
@@ -0,0 +1,133 @@
+"""Latency tracing hooks of the Vakio Openair integration."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import logging
+import random
+import time
+from typing import Any
+
+from .metrics import LatencyStats
+
+_LOGGER: logging.Logger = logging.getLogger(__package__)
+
+# Путь сообщения от брокера: on_message -> разбор -> цикл событий ->
+# обработка координатором -> уведомление сущностей и запись состояния.
+SPAN_INGEST = "ingest"
+STAGE_DECODE = "decode"
+STAGE_QUEUE = "queue"
+STAGE_STATE = "state"
+STAGE_ENTITIES = "entities"
+# Путь команды: координатор -> накопление -> публикация -> ответ устройства.
+SPAN_COMMAND = "command"
+STAGE_COOLDOWN = "cooldown"
+STAGE_PUBLISH = "publish"
+STAGE_ECHO = "echo"
+
+
+class Span:
+    """Путь одного сообщения или команды: отметки этапов от начала."""
+
+    __slots__ = ("kind", "key", "start", "marks")
+
+    def __init__(self, kind: str, key: str) -> None:
+        """Initialize."""
+        self.kind = kind
+        self.key = key
+        self.start = time.perf_counter()
+        self.marks: list[tuple[str, float]] = []
+
+    def mark(self, stage: str) -> None:
+        """Окончание этапа."""
+        self.marks.append((stage, time.perf_counter()))
+
+    def durations(self) -> list[tuple[str, float]]:
+        """Длительности этапов, секунды."""
+        result = []
+        previous = self.start
+        for stage, at in self.marks:
+            result.append((stage, at - previous))
+            previous = at
+        return result
+
+    @property
+    def total(self) -> float:
+        """Длительность всего пути, секунды."""
+        return self.marks[-1][1] - self.start if self.marks else 0.0
+
+
+SpanHook = Callable[[Span], None]
+
+
+class Tracer:
+    """Точка подключения обработчиков трассировки.
+
+    Пока обработчиков нет, enabled ложно и трассировка обходится одной
+    проверкой атрибута. Трассируется доля sample_rate сообщений и команд.
+    """
+
+    __slots__ = ("enabled", "sample_rate", "_hooks")
+
+    def __init__(self, sample_rate: float = 1.0) -> None:
+        """Initialize."""
+        self.enabled = False
+        self.sample_rate = sample_rate
+        self._hooks: list[SpanHook] = []
+
+    def start(self, kind: str, key: str) -> Span | None:
+        """Начало пути, None если он не попал в выборку."""
+        if random.random() >= self.sample_rate:
+            return None
+        return Span(kind, key)
+
+    def finish(self, span: Span) -> None:
+        """Передача завершённого пути обработчикам."""
+        for hook in self._hooks:
+            try:
+                hook(span)
+            except Exception:  # pylint: disable=broad-except
+                _LOGGER.exception("Error in span hook %s", hook)
+
+    def add_hook(self, hook: SpanHook) -> Callable[[], None]:
+        """Подключение обработчика, возвращается функция отключения."""
+        self._hooks = [*self._hooks, hook]
+        self.enabled = True
+
+        def remove() -> None:
+            """Отключение обработчика."""
+            self._hooks = [item for item in self._hooks if item is not hook]
+            self.enabled = bool(self._hooks)
+
+        return remove
+
+
+class SpanStats:
+    """Обработчик, собирающий гистограммы длительностей по этапам."""
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.stages: dict[str, dict[str, LatencyStats]] = {}
+
+    def __call__(self, span: Span) -> None:
+        """Учёт завершённого пути."""
+        stages = self.stages.setdefault(span.kind, {})
+        for stage, duration in span.durations():
+            stages.setdefault(stage, LatencyStats()).add(duration)
+        stages.setdefault("total", LatencyStats()).add(span.total)
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "Span %s %s: %s",
+                span.kind,
+                span.key,
+                ", ".join(
+                    f"{stage} {duration * 1000:.3f} ms"
+                    for stage, duration in span.durations()
+                ),
+            )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Представление для диагностики."""
+        return {
+            kind: {stage: stats.as_dict() for stage, stats in stages.items()}
+            for kind, stages in self.stages.items()
+        }
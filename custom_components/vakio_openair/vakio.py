@@ -2,29 +2,107 @@
 from __future__ import annotations
 
 import asyncio
+from collections import Counter, deque
+from collections.abc import Callable
 import contextlib
+from datetime import datetime, timedelta
+from functools import partial
 import json
 import logging
-import random
+import time
 from typing import Any
 
 import paho.mqtt.client as mqtt
 
-from homeassistant.core import HomeAssistant
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later, async_track_time_interval
+from homeassistant.helpers.update_coordinator import (
+    CoordinatorEntity,
+    DataUpdateCoordinator,
+    UpdateFailed,
+)
 
+from .connection import MqttConnection, backoff_delay, get_pool
 from .const import (
+    COMMAND_COOLDOWN,
     CONF_HOST,
     CONF_PASSWORD,
     CONF_PORT,
     CONF_TOPIC,
     CONF_USERNAME,
-    DEFAULT_TIMEINTERVAL,
+    CONNECTION_TIMEOUT,
+    CONTROLLER_OFF,
+    DEFAULT_COMMAND_TIMEOUT,
+    DEFAULT_CONTROLLER,
+    DEFAULT_CONTROLLER_DWELL,
+    DEFAULT_CONTROLLER_KI,
+    DEFAULT_CONTROLLER_KP,
+    DEFAULT_DEADBAND,
+    DEFAULT_DEADBAND_PERCENT,
+    DEFAULT_HUMIDITY_HYSTERESIS,
+    DEFAULT_HUMIDITY_SETPOINT,
+    DEFAULT_LATENCY_SAMPLE,
+    DEFAULT_MAX_WRITE_INTERVAL,
+    DEFAULT_MIN_WRITE_INTERVAL,
+    DEFAULT_PUBLISH_RETRIES,
+    DEFAULT_QOS,
+    DEFAULT_SMART_EMERG_SHUNT,
     DOMAIN,
+    ERROR_BROKER_DISCONNECTED,
+    ECHO_TIMEOUT,
+    ERROR_CONNECTING,
+    OPENAIR_GATE_LIST,
+    OPENAIR_SPEED_00,
+    OPENAIR_SPEED_LIST,
     OPENAIR_STATE_OFF,
     OPENAIR_STATE_ON,
+    OPENAIR_WORKMODE_MANUAL,
+    OPENAIR_WORKMODE_SUPERAUTO,
+    OPT_COMMAND_TIMEOUT,
+    OPT_CONTROLLER,
+    OPT_CONTROLLER_DWELL,
+    OPT_CONTROLLER_KI,
+    OPT_CONTROLLER_KP,
+    OPT_CONTROLLER_MIN_TEMP,
+    OPT_DEADBAND,
+    OPT_DEADBAND_PERCENT,
+    OPT_EMERG_SHUNT,
+    OPT_HUMIDITY_HYSTERESIS,
+    OPT_HUMIDITY_SETPOINT,
+    OPT_LATENCY_SAMPLE,
+    OPT_MAX_WRITE_INTERVAL,
+    OPT_MIN_WRITE_INTERVAL,
+    OPT_PUBLISH_RETRIES,
+    OPT_QOS,
+    OPT_SMART_GATE,
+    OPT_SMART_SPEED,
     OPT_SMART_TOPIC_ENDPOINT,
     OPT_SMART_TOPIC_PREFIX,
+    OPT_STATISTICS_WINDOWS,
+    OPT_TRACE,
+    PUBLISH_ACK_TIMEOUT,
+    STATISTICS_WINDOWS,
+    TRACE_DIR,
+)
+from .controller import HumidityController
+from .filters import WriteFilter
+from .metrics import LatencyStats
+from .rolling import RollingWindow
+from .storage import get_state_cache
+from .trace import INBOUND, OUTBOUND, TraceRecorder
+from .tracing import (
+    SPAN_COMMAND,
+    SPAN_INGEST,
+    STAGE_COOLDOWN,
+    STAGE_DECODE,
+    STAGE_ECHO,
+    STAGE_ENTITIES,
+    STAGE_PUBLISH,
+    STAGE_QUEUE,
+    STAGE_STATE,
+    Span,
+    SpanStats,
+    Tracer,
 )
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
@@ -43,10 +121,140 @@ ENDPOINTS = [
     TEMP_ENDPOINT,
     HUD_ENDPOINT,
 ]
+# Порядок отправки команд из очереди: сначала включение и режим, затем параметры.
+COMMAND_ORDER = (STATE_ENDPOINT, WORKMODE_ENDPOINT, SPEED_ENDPOINT, GATE_ENDPOINT)
+FAN_ENDPOINTS = frozenset(
+    {SPEED_ENDPOINT, GATE_ENDPOINT, STATE_ENDPOINT, WORKMODE_ENDPOINT}
+)
+SENSOR_ENDPOINTS = (TEMP_ENDPOINT, HUD_ENDPOINT)
+# Ключ параметров режима SMART в потоке значений от брокера.
+SETTINGS_KEY = "settings"
+
+
+def statistics_key(endpoint: str) -> str:
+    """Ключ уведомления об изменении статистики конечной точки."""
+    return f"{endpoint}_statistics"
+
+
+def decode_choice(*choices: str) -> Callable[[bytes], str]:
+    """Декодер перечисления: допустимы только указанные строки."""
+    table = {choice.encode(): choice for choice in choices}
+
+    def decode(payload: bytes) -> str:
+        value = table.get(payload)
+        if value is None:
+            raise ValueError(f"unexpected value {payload!r}")
+        return value
+
+    return decode
+
+
+def decode_int(minimum: int, maximum: int) -> Callable[[bytes], int]:
+    """Декодер целого числа в пределах [minimum, maximum]."""
+
+    def decode(payload: bytes) -> int:
+        value = int(payload)
+        if not minimum <= value <= maximum:
+            raise ValueError(f"value {value} out of range")
+        return value
+
+    return decode
+
+
+def decode_float(payload: bytes) -> float:
+    """Декодер показаний датчиков."""
+    return float(payload)
+
+
+SMART_SETTINGS = (OPT_SMART_GATE, OPT_SMART_SPEED, OPT_EMERG_SHUNT)
+
+
+def decode_settings(payload: bytes) -> dict[str, int]:
+    """Декодер параметров режима SMART: {"settings": [{"gate": 4}, ...]}."""
+    try:
+        settings = {
+            key: int(value)
+            for item in json.loads(payload)["settings"]
+            for key, value in item.items()
+            if key in SMART_SETTINGS
+        }
+    except (KeyError, TypeError, AttributeError) as err:
+        raise ValueError(f"unexpected settings {payload!r}") from err
+    return settings
+
+
+# Реестр конечных точек: для каждой свой декодер значения.
+ENDPOINT_DECODERS: dict[str, Callable[[bytes], Any]] = {
+    SPEED_ENDPOINT: decode_int(OPENAIR_SPEED_00, OPENAIR_SPEED_LIST[-1]),
+    GATE_ENDPOINT: decode_int(OPENAIR_GATE_LIST[0], OPENAIR_GATE_LIST[-1]),
+    STATE_ENDPOINT: decode_choice(OPENAIR_STATE_ON, OPENAIR_STATE_OFF),
+    WORKMODE_ENDPOINT: decode_choice(
+        OPENAIR_WORKMODE_MANUAL, OPENAIR_WORKMODE_SUPERAUTO
+    ),
+    TEMP_ENDPOINT: decode_float,
+    HUD_ENDPOINT: decode_float,
+}
+
+
+class DeviceState:
+    """Состояние устройства.
+
+    Поддерживается доступ по имени конечной точки: state[SPEED_ENDPOINT].
+    """
+
+    __slots__ = (
+        SPEED_ENDPOINT,
+        GATE_ENDPOINT,
+        STATE_ENDPOINT,
+        WORKMODE_ENDPOINT,
+        TEMP_ENDPOINT,
+        HUD_ENDPOINT,
+    )
+
+    speed: int | None
+    gate: int | None
+    state: str | None
+    workmode: str | None
+    temp: float | None
+    hud: float | None
+
+    def __init__(self) -> None:
+        """Initialize."""
+        for endpoint in self.__slots__:
+            setattr(self, endpoint, None)
+
+    def __getitem__(self, endpoint: str) -> Any:
+        """Значение конечной точки."""
+        try:
+            return getattr(self, endpoint)
+        except AttributeError:
+            raise KeyError(endpoint) from None
+
+    def __setitem__(self, endpoint: str, value: Any) -> None:
+        """Установка значения конечной точки."""
+        try:
+            setattr(self, endpoint, value)
+        except AttributeError:
+            raise KeyError(endpoint) from None
+
+    def __contains__(self, endpoint: object) -> bool:
+        """Есть ли такая конечная точка."""
+        return endpoint in self.__slots__
+
+    def as_dict(self) -> dict[str, Any]:
+        """Состояние в виде словаря."""
+        return {endpoint: getattr(self, endpoint) for endpoint in self.__slots__}
+
+    def __repr__(self) -> str:
+        """Представление для журнала."""
+        return f"DeviceState({self.as_dict()})"
 
 
 class MqttClient:
-    """MqttClient class for connecting to a broker."""
+    """MqttClient class for connecting to a broker.
+
+    Клиент устройства работает через общее для брокера подключение из пула.
+    """
 
     def __init__(
         self,
@@ -57,129 +265,381 @@ class MqttClient:
         """Initialize."""
         self.hass = hass
         self.data = data
-
-        self.client_id = f"python-mqtt-{random.randint(0, 1000)}"
-        self._client = mqtt.Client(client_id=self.client_id)
-        self._client.on_connect = self.on_connect
-        self._client.on_message = self.on_message
+        self.topic: str | None = data.get(CONF_TOPIC)
+        # Топик -> (конечная точка, декодер), составляется один раз.
+        self.routes: dict[str, tuple[str, Callable[[bytes], Any]]] = {
+            f"{self.topic}/{endpoint}": (endpoint, decoder)
+            for endpoint, decoder in ENDPOINT_DECODERS.items()
+        }
+        # Параметры режима SMART читаются из того же топика, куда записываются.
+        self.settings_topic = (
+            f"{OPT_SMART_TOPIC_PREFIX}/{self.topic}/{OPT_SMART_TOPIC_ENDPOINT}"
+        )
+        self.routes[self.settings_topic] = (SETTINGS_KEY, decode_settings)
+        # Конечная точка -> топик, для записи трассировки.
+        self.endpoint_topics = {
+            endpoint: topic for topic, (endpoint, _) in self.routes.items()
+        }
+        self.recorder: TraceRecorder | None = None
 
         self._coordinator = coordinator
+        self._connection: MqttConnection | None = None
         self.is_run = False
         self.subscribes_count = 0
-        if len(self.data.keys()) == 5:
-            self._client.username_pw_set(
-                self.data[CONF_USERNAME], self.data[CONF_PASSWORD]
-            )
+        self.qos = DEFAULT_QOS
+        self.retries = DEFAULT_PUBLISH_RETRIES
+        self.ack_latency = LatencyStats()
+        self.published = 0
+        self.publish_failures = 0
+        # Полученные сообщения и время последнего сообщения по конечным точкам.
+        self.received: Counter[str] = Counter()
+        self.last_received: dict[str, float] = {}
+        self.decode_errors = 0
+        # Собственные команды, которые брокер вернёт по подписке на топик
+        # устройства: конечная точка -> очередь (данные, срок ожидания).
+        # Такое эхо не подтверждает команду и пропускается.
+        self._echoes: dict[str, deque[tuple[bytes, float]]] = {
+            endpoint: deque() for endpoint in ENDPOINT_DECODERS
+        }
+
+    @property
+    def is_connected(self) -> bool:
+        """Подключено ли общее соединение к брокеру."""
+        return self._connection is not None and self._connection.is_connected
 
-        self._paho_lock = asyncio.Lock()  # Prevents parallel calls to the MQTT client
-        self.is_connected = False
+    @callback
+    def async_set_connected(self, connected: bool) -> None:
+        """Смена состояния подключения к брокеру."""
+        if self._coordinator is not None:
+            self._coordinator.async_set_connected(connected)
 
     def on_message(self, client, userdata, message: mqtt.MQTTMessage):
-        """Реакция на сообщения."""
-        key = str.split(message.topic, "/")[-1]
-        self._client.unsubscribe(topic=message.topic)
-        value = message.payload.decode()
-        if value is not None:
-            with contextlib.suppress(ValueError):
-                value = int(value)
+        """Реакция на сообщения.
 
-        self._coordinator.condition[key] = value  # type: ignore
-        # for k, val in self._coordinator.condition.items():
-        #     _LOGGER.error("%s: %s", k, val)
+        Сообщения на неизвестные топики отбрасываются.
+        """
+        route = self.routes.get(message.topic)
+        if route is not None:
+            self.dispatch(route[0], route[1], message.payload)
 
-    def on_connect(self, client, userdata, flags, rc):  # pylint: disable=invalid-name
-        """Реакция на подключение."""
-        self.is_connected = True
+    def dispatch(
+        self, endpoint: str, decoder: Callable[[bytes], Any], payload: bytes
+    ) -> None:
+        """Разбор значения конечной точки и передача координатору.
 
-    async def connect(self) -> bool:
-        """Connect with the broker."""
+        Подписка сохраняется, а полученное значение сразу передаётся координатору.
+        Сообщение здесь только разбирается, состояние меняется в цикле событий.
+        """
+        coordinator = self._coordinator
+        if coordinator is None:
+            return
+        span = None
+        if coordinator.tracer.enabled:
+            span = coordinator.tracer.start(SPAN_INGEST, endpoint)
+        self.received[endpoint] += 1
+        self.last_received[endpoint] = time.time()
+        if self.recorder is not None:
+            self.recorder.record(INBOUND, self.endpoint_topics[endpoint], payload)
+        if endpoint in self._echoes and self._echoes[endpoint]:
+            if self._skip_own_echo(self._echoes[endpoint], payload):
+                return
         try:
-            await self.hass.async_add_executor_job(
-                self._client.connect, self.data[CONF_HOST], self.data[CONF_PORT]
-            )
-            self._client.loop_start()
-            return True
-        except OSError as err:
-            _LOGGER.error("Failed to connect to MQTT server due to exception: %s", err)
+            value = decoder(payload)
+        except ValueError as err:
+            self.decode_errors += 1
+            _LOGGER.debug("Dropped %s value of %s: %s", endpoint, self.topic, err)
+            return
+        if span is not None:
+            span.mark(STAGE_DECODE)
+        coordinator.push_update(endpoint, value, span)
 
+    def _skip_own_echo(
+        self, echoes: deque[tuple[bytes, float]], payload: bytes
+    ) -> bool:
+        """Пропуск первого эха собственной команды, устаревшие ожидания удаляются."""
+        now = time.monotonic()
+        while echoes and echoes[0][1] < now:
+            echoes.popleft()
+        if echoes and echoes[0][0] == payload:
+            echoes.popleft()
+            return True
         return False
 
+    def subscriptions(self) -> list[tuple[str, int]]:
+        """Список топиков устройства для подписки.
+
+        Один wildcard на конечные точки устройства и топик параметров SMART.
+        """
+        return [(f"{self.topic}/+", 0), (self.settings_topic, 0)]
+
+    async def connect(self) -> bool:
+        """Connect with the broker."""
+        if self._connection is None:
+            self._connection = get_pool(self.hass).acquire(self.data)
+            await self._connection.register(self)
+        return await self._connection.connect()
+
     async def disconnect(self) -> None:
         """Disconnect from the broker."""
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        await connection.unregister(self)
+        await get_pool(self.hass).release(connection)
 
-        def stop() -> None:
-            """Stop the MQTT client."""
-            self._client.loop_stop()
+    async def try_connect(self) -> bool:
+        """Try to create connection with the broker.
 
-        async with self._paho_lock:
-            self.is_connected = False
-            await self.hass.async_add_executor_job(stop)
-            self._client.disconnect()
+        Если общее подключение к брокеру уже запущено, новое не создаётся.
+        Одновременные проверки одного брокера выполняются одним подключением.
+        """
+        pool = get_pool(self.hass)
+        connection = pool.get(self.data)
+        if connection is not None and connection.is_started:
+            return True
+        return await pool.async_probe(self.data, self._async_probe)
 
-    async def try_connect(self) -> bool:
-        """Try to create connection with the broker."""
-        self._client.on_connect = None
+    async def _async_probe(self) -> bool:
+        """Проверка брокера вне цикла событий, ограничена CONNECTION_TIMEOUT."""
+        try:
+            return await asyncio.wait_for(
+                self.hass.async_add_executor_job(self._probe), CONNECTION_TIMEOUT
+            )
+        except TimeoutError:
+            _LOGGER.debug("MQTT server %s did not answer in time", self.data[CONF_HOST])
+            return False
 
+    def _probe(self) -> bool:
+        """Подключение временным клиентом до получения ответа брокера."""
+        result: list[int] = []
+        client = mqtt.Client()
+        client.on_connect = lambda client, userdata, flags, rc: result.append(rc)
+        if self.data.get(CONF_USERNAME):
+            client.username_pw_set(
+                self.data[CONF_USERNAME], self.data.get(CONF_PASSWORD)
+            )
+        deadline = time.monotonic() + CONNECTION_TIMEOUT
         try:
-            self._client.connect(self.data[CONF_HOST], self.data[CONF_PORT])
-            return True
-        except Exception:  # pylint: disable=broad-exception-caught
+            client.connect(self.data[CONF_HOST], self.data[CONF_PORT])
+            while not result and time.monotonic() < deadline:
+                client.loop(timeout=0.1)
+        except OSError as err:
+            _LOGGER.debug(
+                "MQTT server %s is unreachable: %s", self.data[CONF_HOST], err
+            )
             return False
+        finally:
+            client.disconnect()
+        return result == [mqtt.CONNACK_ACCEPTED]
 
     async def subscribe(self) -> None:
-        """Подписка на топики."""
+        """Подписка на топики.
+
+        Обычно не требуется: подписка выполняется при подключении и сохраняется
+        до разрыва соединения.
+        """
+        if self._connection is None:
+            return
         self.subscribes_count += 1
-        async with self._paho_lock:
-            _, mid = await self.hass.async_add_executor_job(
-                self._client.subscribe,
-                [(f"{self.data[CONF_TOPIC]}/{endpoint}", 0) for endpoint in ENDPOINTS],
-            )
-        for endpoint in ENDPOINTS:
-            _LOGGER.debug("Subscribe to %s, mid: %s, qos: %s", endpoint, mid, 0)
+        mid = await self._connection.subscribe(self.subscriptions())
+        for topic, qos in self.subscriptions():
+            _LOGGER.debug("Subscribe to %s, mid: %s, qos: %s", topic, mid, qos)
 
-    async def get_condition(
-        self,
-    ) -> dict(str, Any):  # type: ignore
+    def metrics(self) -> dict[str, Any]:
+        """Счётчики устройства и общего подключения для диагностики."""
+        now = time.time()
+        return {
+            "received": dict(self.received),
+            "last_message_age": {
+                endpoint: round(now - received, 3)
+                for endpoint, received in self.last_received.items()
+            },
+            "decode_errors": self.decode_errors,
+            "published": self.published,
+            "publish_failures": self.publish_failures,
+            "ack_latency": self.ack_latency.as_dict(),
+            "connection": (
+                self._connection.metrics() if self._connection is not None else None
+            ),
+        }
+
+    async def get_condition(self) -> DeviceState:
         """Get condition of device."""
-        await self.subscribe()
         return self._coordinator.condition  # type: ignore
 
     async def publish(self, endpoint: str, msg: str, prefix: str | None = None) -> bool:
-        """Publish commands to topic."""
-        topic = self.data[CONF_TOPIC] + "/" + endpoint
+        """Publish commands to topic.
+
+        Без подключения к брокеру публикация сразу считается неудачной: paho
+        поставил бы её в очередь и отправил после переподключения, когда
+        команда уже отменена. Если подтверждение не пришло за
+        PUBLISH_ACK_TIMEOUT секунд, ожидание повторяется до self.retries раз.
+        Сообщение QoS 0 при этом публикуется заново, а QoS 1 и 2 paho хранит
+        сам и повторно не публикуется. Задержка подтверждения учитывается в
+        self.ack_latency.
+        """
+        connection = self._connection
+        topic = self.topic + "/" + endpoint  # type: ignore
         if prefix is not None:
             topic = prefix + "/" + topic
+        if connection is None or not connection.is_connected:
+            self.publish_failures += 1
+            _LOGGER.debug("Not connected, publish to %s dropped", topic)
+            return False
+        if self.recorder is not None:
+            self.recorder.record(OUTBOUND, topic, msg)
+        self.published += 1
 
-        qos = 0
         retain = True
-        async with self._paho_lock:
-            await self.hass.async_add_executor_job(
-                self._client.publish, topic, msg, qos, retain
-            )
+        echoes = self._echoes.get(endpoint) if prefix is None else None
+        mid: int | None = None
+        for attempt in range(self.retries + 1):
+            if mid is None or self.qos == 0:
+                started = time.monotonic()
+                # Ожидание регистрируется до публикации: эхо может прийти раньше ответа.
+                if echoes is not None:
+                    echoes.append((str(msg).encode(), started + ECHO_TIMEOUT))
+                mid, ack = await connection.publish(topic, msg, self.qos, retain)
+            try:
+                await asyncio.wait_for(asyncio.shield(ack), PUBLISH_ACK_TIMEOUT)
+            except TimeoutError:
+                if self.qos == 0:
+                    connection.forget(mid)
+                _LOGGER.debug(
+                    "No ack for %s (qos %s), attempt %s", topic, self.qos, attempt + 1
+                )
+                continue
+            latency = time.monotonic() - started
+            self.ack_latency.add(latency)
+            _LOGGER.debug("Published %s (qos %s) in %.3f s", topic, self.qos, latency)
+            return True
 
-        return True
+        connection.forget(mid)  # type: ignore[arg-type]
+        self.publish_failures += 1
+        _LOGGER.warning(
+            "Publish to %s was not acknowledged after %s attempts",
+            topic,
+            self.retries + 1,
+        )
+        return False
 
 
 class Coordinator(DataUpdateCoordinator):
     """Class for interact with Broker and HA."""
 
-    def __init__(self, hass: HomeAssistant, data: dict(str, Any)) -> None:  # type: ignore
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        data: dict(str, Any),  # type: ignore
+        options: dict[str, Any] | None = None,
+    ) -> None:
         """Функция инициализации."""
-        super().__init__(
-            hass, _LOGGER, name=DOMAIN, update_interval=DEFAULT_TIMEINTERVAL
-        )
+        super().__init__(hass, _LOGGER, name=DOMAIN)
         self._data = data
+        self._options = options or {}
         self.mqttc = MqttClient(self.hass, data, self)
+        self.mqttc.qos = self._options.get(OPT_QOS, DEFAULT_QOS)
+        self.mqttc.retries = self._options.get(
+            OPT_PUBLISH_RETRIES, DEFAULT_PUBLISH_RETRIES
+        )
         self.last_update = None
-        self.condition = {
-            GATE_ENDPOINT: None,
-            SPEED_ENDPOINT: None,
-            WORKMODE_ENDPOINT: None,
-            STATE_ENDPOINT: None,
-            TEMP_ENDPOINT: None,
-            HUD_ENDPOINT: None,
-        }
+        self.condition = DeviceState()
+        # До первого подключения к брокеру устройство недоступно.
+        self.last_update_success = False
+        self.last_exception = UpdateFailed(ERROR_CONNECTING)
         self.is_logged_in = False
+        self._connect_task: asyncio.Task | None = None
+        # Очередь значений из потока paho и признак запланированного применения.
+        self._incoming: deque[tuple[str, Any]] = deque()
+        self._flush_scheduled = False
+        # Версии значений по конечным точкам (число изменений, выводится в
+        # диагностике) и набор изменённых точек при уведомлении.
+        self.versions: dict[str, int] = dict.fromkeys(ENDPOINTS, 0)
+        self._dirty: set[str] | None = None
+        # Очередь команд: конечная точка -> последнее значение.
+        self._commands: dict[str, Any] = {}
+        self._commands_unsub: CALLBACK_TYPE | None = None
+        # Оптимистичное состояние: неподтверждённые команды и значения от брокера.
+        self.command_timeout: float = self._options.get(
+            OPT_COMMAND_TIMEOUT, DEFAULT_COMMAND_TIMEOUT
+        )
+        self._pending: dict[str, tuple[Any, CALLBACK_TYPE]] = {}
+        self._confirmed: dict[str, Any] = {}
+        # Трассировка задержек: пути сообщений ждут применения в очереди,
+        # пути команд - подтверждения от устройства.
+        self.tracer = Tracer()
+        self.span_stats: SpanStats | None = None
+        self._spans: deque[Span] = deque()
+        self._command_spans: dict[str, Span] = {}
+        sample = self._options.get(OPT_LATENCY_SAMPLE, DEFAULT_LATENCY_SAMPLE)
+        if sample:
+            self.tracer.sample_rate = sample / 100
+            self.span_stats = SpanStats()
+            self.tracer.add_hook(self.span_stats)
+        # Записи состояния сущностей устройства: уникальный id -> число записей.
+        self.state_writes: Counter[str] = Counter()
+        # Фильтры записи показаний датчиков и таймеры отложенной записи.
+        self._filters: dict[str, WriteFilter] = {
+            endpoint: WriteFilter(
+                self._options.get(f"{endpoint}_{OPT_DEADBAND}", DEFAULT_DEADBAND),
+                self._options.get(
+                    f"{endpoint}_{OPT_DEADBAND_PERCENT}", DEFAULT_DEADBAND_PERCENT
+                ),
+                self._options.get(
+                    f"{endpoint}_{OPT_MIN_WRITE_INTERVAL}", DEFAULT_MIN_WRITE_INTERVAL
+                ),
+                self._options.get(
+                    f"{endpoint}_{OPT_MAX_WRITE_INTERVAL}", DEFAULT_MAX_WRITE_INTERVAL
+                ),
+            )
+            for endpoint in SENSOR_ENDPOINTS
+        }
+        self._trailing: dict[str, CALLBACK_TYPE] = {}
+        # Запись трассировки MQTT, если включена в параметрах.
+        if self._options.get(OPT_TRACE):
+            self.mqttc.recorder = TraceRecorder(
+                hass, hass.config.path(TRACE_DIR, f"{data[CONF_TOPIC]}.jsonl")
+            )
+            self.mqttc.recorder.async_start()
+        # Последние известные параметры режима SMART.
+        self.smart_settings: dict[str, int] = {}
+        # Регулятор влажности, если включён в параметрах.
+        self.controller: HumidityController | None = None
+        mode = self._options.get(OPT_CONTROLLER, DEFAULT_CONTROLLER)
+        if mode != CONTROLLER_OFF:
+            self.controller = HumidityController(
+                mode,
+                self._options.get(OPT_HUMIDITY_SETPOINT, DEFAULT_HUMIDITY_SETPOINT),
+                self._options.get(OPT_HUMIDITY_HYSTERESIS, DEFAULT_HUMIDITY_HYSTERESIS),
+                self._options.get(OPT_CONTROLLER_KP, DEFAULT_CONTROLLER_KP),
+                self._options.get(OPT_CONTROLLER_KI, DEFAULT_CONTROLLER_KI),
+                self._options.get(OPT_CONTROLLER_DWELL, DEFAULT_CONTROLLER_DWELL),
+                self._options.get(OPT_CONTROLLER_MIN_TEMP, DEFAULT_SMART_EMERG_SHUNT),
+            )
+        # Скользящая статистика датчиков: конечная точка -> окно -> буфер.
+        self.statistics: dict[str, dict[str, RollingWindow]] = {
+            endpoint: {
+                window: RollingWindow(STATISTICS_WINDOWS[window])
+                for window in self._options.get(OPT_STATISTICS_WINDOWS, [])
+            }
+            for endpoint in SENSOR_ENDPOINTS
+            if self._options.get(OPT_STATISTICS_WINDOWS)
+        }
+        # Без новых показаний статистика пересчитывается по таймеру: старые
+        # корзины выходят из окна.
+        self._statistics_unsub: CALLBACK_TYPE | None = None
+        if self.statistics:
+            self._statistics_unsub = async_track_time_interval(
+                hass,
+                self._async_statistics_timer,
+                timedelta(
+                    seconds=min(
+                        window.width
+                        for windows in self.statistics.values()
+                        for window in windows.values()
+                    )
+                ),
+            )
 
     async def async_login(self) -> bool:
         """Авторизация в брокере."""
@@ -187,76 +647,465 @@ class Coordinator(DataUpdateCoordinator):
             return True
 
         status = await self.mqttc.connect()
-        await self.mqttc.subscribe()
         if not status:
             _LOGGER.error("Auth error")
-        self.is_logged_in = True
+        self.is_logged_in = status
+        if self.mqttc.is_connected:
+            # Общее подключение уже установлено другим устройством.
+            self.async_set_connected(True)
         return status
 
-    async def _async_update_data(self) -> bool:
-        """Get all data."""
-        await self.mqttc.get_condition()
+    @callback
+    def async_start(self) -> None:
+        """Запуск подключения к брокеру в фоне, останавливается в async_shutdown."""
+        self._connect_task = self.hass.async_create_background_task(
+            self.async_connect(), f"{DOMAIN} {self.mqttc.topic} connect"
+        )
+
+    async def async_connect(self) -> None:
+        """Подключение к брокеру в фоне.
+
+        Пока подключение не установлено, устройство недоступно, попытки
+        повторяются с экспоненциальной задержкой.
+        """
+        attempt = 0
+        while not await self.async_login():
+            if attempt == 0:
+                # Восстановленное из кэша состояние больше не актуально.
+                self.async_set_connected(False)
+            await asyncio.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    async def async_restore(self) -> None:
+        """Восстановление последнего известного состояния из кэша.
+
+        Сохранённые значения показываются сразу, а при получении данных от
+        брокера заменяются актуальными.
+        """
+        cache = get_state_cache(self.hass)
+        await cache.async_load()
+        snapshot = {
+            key: value
+            for key, value in cache.get(self._data[CONF_TOPIC]).items()
+            if key in self.condition
+        }
+        if not snapshot:
+            return
+        for key, value in snapshot.items():
+            self.condition[key] = value
+        self._confirmed.update(snapshot)
+        self.last_update_success = True
+        self.last_exception = None
+
+    @callback
+    def async_set_connected(self, connected: bool) -> None:
+        """Смена состояния подключения к брокеру.
+
+        При разрыве соединения устройство становится недоступным, после
+        переподключения брокер заново присылает сохранённые значения.
+        """
+        if not connected:
+            self.async_set_update_error(UpdateFailed(ERROR_BROKER_DISCONNECTED))
+        elif not self.last_update_success:
+            self.async_set_updated_data(self.condition)
+
+    async def _async_update_data(self) -> DeviceState:
+        """Get all data.
+
+        Данные приходят от брокера по подписке, опрос не требуется. Без
+        подключения к брокеру обновление не возвращает доступность устройству.
+        """
+        if not self.mqttc.is_connected:
+            raise UpdateFailed(ERROR_BROKER_DISCONNECTED)
+        return await self.mqttc.get_condition()
+
+    def push_update(self, key: str, value: Any, span: Span | None = None) -> None:
+        """Передача значения, полученного от брокера.
+
+        Может вызываться из потока paho. Значения складываются в очередь, а
+        применяются одним пакетом в цикле событий.
+        """
+        if span is not None:
+            self._spans.append(span)
+        self._incoming.append((key, value))
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            self.hass.loop.call_soon_threadsafe(self._async_flush_incoming)
+
+    @callback
+    def _async_flush_incoming(self) -> None:
+        """Применение накопленных значений и одно уведомление подписчиков."""
+        self._flush_scheduled = False
+        spans: list[Span] = []
+        while self._spans:
+            span = self._spans.popleft()
+            span.mark(STAGE_QUEUE)
+            spans.append(span)
+        changes: dict[str, Any] = {}
+        sampled: set[str] = set()
+        now = time.monotonic()
+        while self._incoming:
+            key, value = self._incoming.popleft()
+            if key == SETTINGS_KEY:
+                self.smart_settings.update(value)
+                continue
+            changes[key] = value
+            # Статистика считается по каждому показанию, до фильтров записи.
+            if key in self.statistics:
+                for window in self.statistics[key].values():
+                    window.add(value, now)
+                sampled.add(key)
+        # Пересчёт один раз на окно за пакет, подписчики уведомляются только
+        # при изменении значений.
+        sampled = {
+            statistics_key(key) for key in sampled if self._refresh_statistics(key, now)
+        }
+
+        confirmed_changed = False
+        for key, value in list(changes.items()):
+            if self._confirmed.get(key) != value:
+                self._confirmed[key] = value
+                confirmed_changed = True
+            if key not in self._pending:
+                continue
+            # Пока команда не подтверждена, устаревшие значения не применяются.
+            if value == self._pending[key][0]:
+                self._pending.pop(key)[1]()
+                if (span := self._command_spans.pop(key, None)) is not None:
+                    span.mark(STAGE_ECHO)
+                    self.tracer.finish(span)
+            del changes[key]
+
+        if self.controller is not None:
+            self._async_run_controller(changes, now)
+        self._async_filter_sensors(changes)
+        for span in spans:
+            span.mark(STAGE_STATE)
+        self._async_apply(changes, sampled)
+        for span in spans:
+            span.mark(STAGE_ENTITIES)
+            self.tracer.finish(span)
+        # В кэш попадают только подтверждённые брокером значения.
+        if confirmed_changed:
+            get_state_cache(self.hass).async_set(
+                self._data[CONF_TOPIC], self._confirmed
+            )
+
+    def _refresh_statistics(self, endpoint: str, now: float) -> bool:
+        """Пересчёт окон статистики конечной точки, "истина" при изменении."""
+        changed = False
+        for window in self.statistics[endpoint].values():
+            changed |= window.refresh(now)
+        return changed
+
+    @callback
+    def _async_statistics_timer(self, _: datetime) -> None:
+        """Пересчёт статистики по таймеру и уведомление при изменении."""
+        now = time.monotonic()
+        touched = {
+            statistics_key(endpoint)
+            for endpoint in self.statistics
+            if self._refresh_statistics(endpoint, now)
+        }
+        if touched:
+            self._async_apply({}, touched)
+
+    @callback
+    def _async_run_controller(self, changes: dict[str, Any], now: float) -> None:
+        """Расчёт регулятора по новым показаниям и постановка команд.
+
+        Регулятор управляет только включённым устройством в ручном режиме.
+        Состояние берётся с учётом значений этого же пакета: устройство, только
+        что сообщившее о выключении, уже не регулируется.
+        """
+        controller: HumidityController = self.controller  # type: ignore
+        if TEMP_ENDPOINT in changes:
+            controller.temperature = changes[TEMP_ENDPOINT]
+        if HUD_ENDPOINT not in changes:
+            return
+        current = {
+            endpoint: changes.get(endpoint, self.condition[endpoint])
+            for endpoint in FAN_ENDPOINTS
+        }
+        if (
+            current[STATE_ENDPOINT] != OPENAIR_STATE_ON
+            or current[WORKMODE_ENDPOINT] != OPENAIR_WORKMODE_MANUAL
+        ):
+            controller.reset()
+            return
+        speed = controller.evaluate(changes[HUD_ENDPOINT], now)
+        if speed is None:
+            return
+        _LOGGER.debug("Controller of %s sets speed %s", self._data[CONF_TOPIC], speed)
+        if current[GATE_ENDPOINT] != OPENAIR_GATE_LIST[-1]:
+            self.async_queue_command(GATE_ENDPOINT, OPENAIR_GATE_LIST[-1])
+        if current[SPEED_ENDPOINT] != speed:
+            self.async_queue_command(SPEED_ENDPOINT, speed)
+
+    @callback
+    def _async_filter_sensors(self, changes: dict[str, Any]) -> None:
+        """Отбор показаний датчиков по зоне нечувствительности и интервалам.
+
+        Отложенные значения записываются по таймеру.
+        """
+        now = time.monotonic()
+        for key, write_filter in self._filters.items():
+            if key not in changes:
+                continue
+            delay = write_filter.evaluate(changes[key], self.condition[key], now)
+            if delay == 0:
+                continue
+            del changes[key]
+            if delay is not None and key not in self._trailing:
+                self._trailing[key] = async_call_later(
+                    self.hass, delay, partial(self._async_trailing_write, key)
+                )
+
+    @callback
+    def _async_trailing_write(self, key: str, now: datetime) -> None:
+        """Запись отложенного показания датчика."""
+        self._trailing.pop(key, None)
+        value = self._filters[key].flush(time.monotonic())
+        if value is not None:
+            self._async_apply({key: value})
+
+    @callback
+    def _async_apply(
+        self, changes: dict[str, Any], touched: set[str] | None = None
+    ) -> None:
+        """Применение изменений и уведомление подписчиков изменённых точек.
+
+        touched - дополнительные ключи уведомления, например обновлённая статистика.
+        """
+        dirty: set[str] = set(touched or ())
+        for key, value in changes.items():
+            if key in self.condition and self.condition[key] != value:
+                self.condition[key] = value
+                self.versions[key] += 1
+                dirty.add(key)
+        if not dirty:
+            return
+
+        self._dirty = dirty
+        try:
+            if self.mqttc.is_connected:
+                self.async_set_updated_data(self.condition)
+            else:
+                # Без подключения к брокеру доступность устройства не меняется:
+                # откат команды или отложенная запись не делают его доступным.
+                self.async_update_listeners()
+        finally:
+            self._dirty = None
+
+    @property
+    def dirty(self) -> set[str] | None:
+        """Изменённые конечные точки при текущем уведомлении.
+
+        None означает полное обновление, например при смене доступности.
+        """
+        return self._dirty
+
+    def metrics(self) -> dict[str, Any]:
+        """Счётчики устройства для диагностики."""
+        return {
+            "available": self.last_update_success,
+            "pending": sorted(self._pending),
+            "versions": dict(self.versions),
+            "state_writes": dict(self.state_writes),
+            "spans": self.span_stats.as_dict() if self.span_stats is not None else None,
+            "mqtt": self.mqttc.metrics(),
+        }
+
+    def is_pending(self, endpoint: str) -> bool:
+        """Ожидает ли команда конечной точки подтверждения от устройства."""
+        return endpoint in self._pending
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Уведомление подписчиков.
+
+        Подписчик, у которого контекстом указан набор конечных точек, уведомляется
+        только при изменении одной из них. Если набор изменений неизвестен
+        (например, сменилась доступность), уведомляются все подписчики.
+        """
+        dirty = self._dirty
+        for update_callback, context in list(self._listeners.values()):
+            if dirty is None or not context or not dirty.isdisjoint(context):
+                update_callback()
+
+    @callback
+    def async_queue_command(self, endpoint: str, value: Any) -> bool:
+        """Постановка команды в очередь устройства.
+
+        Команды копятся COMMAND_COOLDOWN секунд, для каждой конечной точки
+        остаётся только последнее значение, затем все команды отправляются разом.
+        Значение сразу применяется к состоянию и ожидает подтверждения от брокера.
+        """
+        self._commands[endpoint] = value
+        if self.tracer.enabled:
+            span = self.tracer.start(SPAN_COMMAND, endpoint)
+            if span is not None:
+                self._command_spans[endpoint] = span
+            else:
+                self._command_spans.pop(endpoint, None)
+        if endpoint in self._pending:
+            self._pending.pop(endpoint)[1]()
+        self._pending[endpoint] = (
+            value,
+            async_call_later(
+                self.hass,
+                self.command_timeout,
+                partial(self._async_command_timeout, endpoint),
+            ),
+        )
+        self._async_apply({endpoint: value})
+        if self._commands_unsub is None:
+            self._commands_unsub = async_call_later(
+                self.hass, COMMAND_COOLDOWN, self._async_commands_timer
+            )
         return True
 
-    async def _async_update(self, now) -> None:
-        """Async Update.
+    @callback
+    def _async_command_timeout(self, endpoint: str, now: datetime) -> None:
+        """Команда не подтверждена: возврат к последнему полученному значению."""
+        if self._pending.pop(endpoint, None) is None:
+            return
+        self._command_spans.pop(endpoint, None)
+        _LOGGER.warning(
+            "Command %s for %s was not confirmed in %s s, rolling back",
+            endpoint,
+            self.mqttc.topic,
+            self.command_timeout,
+        )
+        self._async_apply({endpoint: self._confirmed.get(endpoint)})
+
+    @callback
+    def _async_commands_timer(self, now: datetime) -> None:
+        """Истечение времени накопления команд."""
+        self._commands_unsub = None
+        self.hass.async_create_task(self.async_flush_commands())
+
+    async def async_flush_commands(self) -> None:
+        """Отправка накопленных команд в порядке COMMAND_ORDER."""
+        if self._commands_unsub is not None:
+            self._commands_unsub()
+            self._commands_unsub = None
+        commands, self._commands = self._commands, {}
+        # Публикации ставятся в очередь по порядку, подтверждения ожидаются вместе.
+        await asyncio.gather(
+            *(
+                self._async_publish_command(endpoint, commands[endpoint])
+                for endpoint in COMMAND_ORDER
+                if endpoint in commands
+            )
+        )
+
+    async def _async_publish_command(self, endpoint: str, value: Any) -> bool:
+        """Публикация команды с отметками трассировки."""
+        span = self._command_spans.get(endpoint)
+        if span is not None:
+            span.mark(STAGE_COOLDOWN)
+        result = await self.mqttc.publish(endpoint, value)
+        if span is not None:
+            span.mark(STAGE_PUBLISH)
+        return result
 
-        Функция регистритуется в hass, во всех датчиках и устройствах и контролирует
-        обновление данных через API не чаще чем раз в 2 секунды.
+    async def async_apply_state(self, state: dict[str, Any]) -> list[str]:
+        """Перевод устройства в заданное состояние.
+
+        Отправляются только значения, отличающиеся от текущего состояния, сразу,
+        без ожидания COMMAND_COOLDOWN. Возвращается список изменённых точек.
         """
-        await self.mqttc.get_condition()
+        changed = [
+            endpoint
+            for endpoint in COMMAND_ORDER
+            if endpoint in state and self.condition[endpoint] != state[endpoint]
+        ]
+        for endpoint in changed:
+            self.async_queue_command(endpoint, state[endpoint])
+        if self._commands:
+            await self.async_flush_commands()
+        return changed
+
+    async def async_shutdown(self) -> None:
+        """Отправка оставшихся команд и остановка координатора.
+
+        Таймеры и фоновые задачи отменяются, подключение к брокеру закрывается
+        отдельно, в MqttClient.disconnect.
+        """
+        # Фоновое подключение останавливается первым, иначе оно может снова
+        # занять соединение пула после MqttClient.disconnect.
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._connect_task
+            self._connect_task = None
+        await self.async_flush_commands()
+        for _, cancel in self._pending.values():
+            cancel()
+        self._pending.clear()
+        for cancel in self._trailing.values():
+            cancel()
+        self._trailing.clear()
+        if self._statistics_unsub is not None:
+            self._statistics_unsub()
+            self._statistics_unsub = None
+        self._command_spans.clear()
+        if self.mqttc.recorder is not None:
+            await self.mqttc.recorder.async_stop()
+        await super().async_shutdown()
 
     async def speed(self, value: int | None = None) -> int | bool | None:
         """Speed of fan."""
         if value is None:
-            return self.condition[SPEED_ENDPOINT]
+            return self.condition.speed
 
-        return await self.mqttc.publish(SPEED_ENDPOINT, value)  # type: ignore
+        return self.async_queue_command(SPEED_ENDPOINT, value)
 
     async def gate(self, value: int | None = None) -> int | bool | None:
         """Gate of device."""
         if value is None:
-            return self.condition[GATE_ENDPOINT]
+            return self.condition.gate
 
-        return await self.mqttc.publish(GATE_ENDPOINT, value)  # type: ignore
+        return self.async_queue_command(GATE_ENDPOINT, value)
 
     async def state(self, value: str | None = None) -> str | bool | None:
         """State of device."""
         if value is None:
-            return self.condition[STATE_ENDPOINT]
+            return self.condition.state
 
-        return await self.mqttc.publish(STATE_ENDPOINT, value)
+        return self.async_queue_command(STATE_ENDPOINT, value)
 
     async def workmode(self, value: str | None = None) -> str | bool | None:
         """Workmode of device: manual or super_auto."""
         if value is None:
-            return self.condition[WORKMODE_ENDPOINT]
+            return self.condition.workmode
 
-        return await self.mqttc.publish(WORKMODE_ENDPOINT, value)
+        return self.async_queue_command(WORKMODE_ENDPOINT, value)
 
     def get_speed(self) -> int | bool | None:
         """Speed of fan."""
-        return self.condition[SPEED_ENDPOINT]
+        return self.condition.speed
 
     def get_gate(self) -> int | bool | None:
         """Gate of device."""
-        return self.condition[GATE_ENDPOINT]
+        return self.condition.gate
 
     def get_state(self) -> str | bool | None:
         """State of device."""
-        return self.condition[STATE_ENDPOINT]
+        return self.condition.state
 
     def get_workmode(self) -> str | bool | None:
         """Workmode of device: manual or super_auto."""
-        return self.condition[WORKMODE_ENDPOINT]
+        return self.condition.workmode
 
-    def get_temp(self) -> int | bool | None:
+    def get_temp(self) -> float | None:
         """Возвращается текущая температура с внутреннего датчика устройства."""
-        return self.condition[TEMP_ENDPOINT]
+        return self.condition.temp
 
-    def get_hud(self) -> int | bool | None:
+    def get_hud(self) -> float | None:
         """Возвращается текущая влажность с внутреннего датчика устройства."""
-        return self.condition[HUD_ENDPOINT]
+        return self.condition.hud
 
     async def turn_on(self) -> bool:
         """Включение устройства."""
@@ -272,15 +1121,34 @@ class Coordinator(DataUpdateCoordinator):
         return current_state == OPENAIR_STATE_ON
 
     async def update_smart_mode(self, emerg_hunt: int, gate: int, speed: int) -> None:
-        """Изменение параметров режима SMART."""
-        command = {
-            "settings": [
-                {"gate": gate},
-                {"smart_speed": speed},
-                {"emerg_shunt": emerg_hunt},
-            ]
+        """Изменение параметров режима SMART.
+
+        Если параметры не отличаются от прочитанных с устройства, ничего не
+        отправляется. Иначе публикуется полный документ параметров: он
+        сохраняется брокером и читается обратно после перезапуска.
+        """
+        settings = {
+            **self.smart_settings,
+            OPT_SMART_GATE: gate,
+            OPT_SMART_SPEED: speed,
+            OPT_EMERG_SHUNT: emerg_hunt,
         }
+        if settings == self.smart_settings:
+            _LOGGER.debug("SMART settings of %s are up to date", self._data[CONF_TOPIC])
+            return
+        command = {"settings": [{key: value} for key, value in settings.items()]}
         command_json = json.dumps(command)
-        await self.mqttc.publish(
+        if await self.mqttc.publish(
             OPT_SMART_TOPIC_ENDPOINT, command_json, OPT_SMART_TOPIC_PREFIX
-        )
+        ):
+            self.smart_settings = settings
+
+
+class VakioEntity(CoordinatorEntity[Coordinator]):
+    """Сущность устройства, записи состояния учитываются в счётчиках координатора."""
+
+    @callback
+    def async_write_ha_state(self) -> None:
+        """Запись состояния с учётом в счётчиках координатора."""
+        self.coordinator.state_writes[self.unique_id] += 1
+        super().async_write_ha_state()
@@ -0,0 +1,219 @@
+"""Micro-benchmarks of the Vakio Openair ingest and command paths.
+
+Запуск без брокера и сети, результат - JSON:
+
+    python tools/bench.py --devices 1 10 100 1000 --output bench.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+from typing import Any
+
+import harness
+
+# pylint: disable=wrong-import-order
+from custom_components.vakio_openair.const import DOMAIN, TRANSPORT_ASYNCIO
+from custom_components.vakio_openair.fan import (
+    LIMITED_SUPPORT,
+    PRESET_MODS,
+    VakioOpenAirFan,
+)
+
+# Значения конечных точек, которые циклически получает каждое устройство.
+PAYLOADS = {
+    "speed": [b"1", b"2", b"3", b"4", b"5"],
+    "gate": [b"1", b"2", b"3", b"4"],
+    "state": [b"on", b"off"],
+    "workmode": [b"manual", b"super_auto"],
+    "temp": [b"20.5", b"21.0", b"21.5"],
+    "hud": [b"40", b"41", b"42.5"],
+}
+
+
+def build_messages(devices: int, count: int) -> list[Any]:
+    """Поток из count сообщений, равномерно по устройствам и конечным точкам."""
+    endpoints = list(PAYLOADS)
+    messages = []
+    for index in range(count):
+        device, step = index % devices, index // devices
+        endpoint = endpoints[step % len(endpoints)]
+        values = PAYLOADS[endpoint]
+        payload = values[(step // len(endpoints)) % len(values)]
+        messages.append(harness.make_message(f"vakio{device}/{endpoint}", payload))
+    return messages
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """p50/p95/p99 в микросекундах, в пределах выборки."""
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {
+        "p50_us": round(cuts[49] * 1e6, 2),
+        "p95_us": round(cuts[94] * 1e6, 2),
+        "p99_us": round(cuts[98] * 1e6, 2),
+    }
+
+
+async def bench_ingest(hass, client, messages: list[Any]) -> dict[str, Any]:
+    """Приём сообщений: разбор в on_message и применение в цикле событий.
+
+    Цикл событий получает управление после каждого сообщения, как при
+    доставке из сетевого потока, поэтому пакеты не укрупняются искусственно.
+    """
+    dispatch = 0.0
+    started = time.perf_counter()
+    for message in messages:
+        before = time.perf_counter()
+        client.deliver(message)
+        dispatch += time.perf_counter() - before
+        await asyncio.sleep(0)
+    await harness.async_drain(hass)
+    elapsed = time.perf_counter() - started
+    return {
+        "messages": len(messages),
+        "msgs_per_s": round(len(messages) / elapsed),
+        "dispatch_us": round(dispatch / len(messages) * 1e6, 3),
+    }
+
+
+async def bench_latency(hass, client, coordinator, samples: int) -> dict[str, Any]:
+    """Задержка от получения сообщения до уведомления подписчиков координатора."""
+    notified: list[float] = []
+    remove = coordinator.async_add_listener(
+        lambda: notified.append(time.perf_counter())
+    )
+    results = []
+    topic = f"{coordinator.mqttc.topic}/speed"
+    for index in range(samples):
+        message = harness.make_message(topic, b"2" if index % 2 else b"3")
+        notified.clear()
+        started = time.perf_counter()
+        client.deliver(message)
+        while not notified:
+            await asyncio.sleep(0)
+        results.append(notified[0] - started)
+    remove()
+    return percentiles(results)
+
+
+async def bench_publish(hass, coordinator, samples: int) -> dict[str, Any]:
+    """Публикация команды до получения подтверждения."""
+    results = []
+    for index in range(samples):
+        started = time.perf_counter()
+        await coordinator.mqttc.publish("speed", str(index % 5 + 1))
+        results.append(time.perf_counter() - started)
+    return percentiles(results)
+
+
+def bench_getters(coordinator, number: int) -> dict[str, float]:
+    """Геттеры координатора, нс на вызов."""
+    return {
+        name: round(
+            timeit.timeit(getattr(coordinator, name), number=number) / number * 1e9,
+            1,
+        )
+        for name in (
+            "get_speed",
+            "get_gate",
+            "get_state",
+            "get_workmode",
+            "get_temp",
+            "get_hud",
+            "is_on",
+        )
+    }
+
+
+def bench_fan(hass, entry_id: str, number: int) -> dict[str, float]:
+    """Пересчёт состояния вентилятора по данным координатора, нс на вызов."""
+    fan = VakioOpenAirFan(
+        hass, "bench", "OpenAir", entry_id, LIMITED_SUPPORT, PRESET_MODS
+    )
+    return {
+        name: round(timeit.timeit(getattr(fan, name), number=number) / number * 1e9, 1)
+        for name in ("update_speed", "update_preset_mode", "update_on_off")
+    }
+
+
+async def bench_allocations(hass, client, messages: list[Any]) -> dict[str, Any]:
+    """Память на сообщение: пик выделений и прирост занятых блоков."""
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    for message in messages:
+        client.deliver(message)
+        await asyncio.sleep(0)
+    await harness.async_drain(hass)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "peak_bytes_per_msg": round(peak / len(messages), 1),
+        "retained_blocks_per_msg": round(
+            (sys.getallocatedblocks() - blocks) / len(messages), 3
+        ),
+    }
+
+
+async def run(devices: int, args: argparse.Namespace) -> dict[str, Any]:
+    """Все замеры для заданного числа устройств."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await harness.async_create_hass(config_dir)
+        coordinators = await harness.async_setup_devices(hass, devices, args.transport)
+        client = harness.fake_client(hass, args.transport)
+        messages = build_messages(devices, max(args.messages, devices * 6))
+        # Прогрев: первые сообщения заполняют состояние устройств.
+        await bench_ingest(hass, client, messages[: devices * 6])
+
+        result = {
+            "devices": devices,
+            "ingest": await bench_ingest(hass, client, messages),
+            "dispatch_latency": await bench_latency(
+                hass, client, coordinators[0], args.samples
+            ),
+            "publish_latency": await bench_publish(hass, coordinators[0], args.samples),
+            "getters_ns": bench_getters(coordinators[0], args.number),
+            "fan_update_ns": bench_fan(hass, "entry0", args.number),
+            "allocations": await bench_allocations(hass, client, messages),
+        }
+        await harness.async_teardown(hass, coordinators)
+        hass.data.pop(DOMAIN, None)
+    return result
+
+
+def main() -> None:
+    """Запуск замеров и вывод JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--messages", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument(
+        "--transport", choices=["asyncio", "thread"], default=TRANSPORT_ASYNCIO
+    )
+    parser.add_argument("--output", help="write JSON to a file instead of stdout")
+    args = parser.parse_args()
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "transport": args.transport,
+        "results": [asyncio.run(run(devices, args)) for devices in args.devices],
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
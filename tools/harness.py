@@ -0,0 +1,263 @@
+"""Offline harness for the Vakio Openair integration.
+
+Заменяет клиент paho на клиента в памяти и поднимает интеграцию на
+незапущенном экземпляре HomeAssistant: без брокера, сети и платформ, а через
+async_create_hass_with_entries - с записями интеграции и платформами.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from dataclasses import dataclass
+import itertools
+from pathlib import Path
+import sys
+from typing import Any
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# pylint: disable=wrong-import-position
+from homeassistant import config_entries, loader  # noqa: E402
+from homeassistant.core import HomeAssistant  # noqa: E402
+from homeassistant.helpers import (  # noqa: E402
+    area_registry as ar,
+    device_registry as dr,
+    entity,
+    entity_registry as er,
+)
+
+from custom_components.vakio_openair.connection import (  # noqa: E402
+    TRANSPORTS,
+    AsyncioMqttConnection,
+    MqttConnection,
+    get_pool,
+)
+from custom_components.vakio_openair.const import (  # noqa: E402
+    CONF_HOST,
+    CONF_PORT,
+    CONF_TOPIC,
+    CONF_TRANSPORT,
+    DOMAIN,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_THREAD,
+)
+from custom_components.vakio_openair.vakio import (  # noqa: E402
+    Coordinator,
+    MqttClient,
+)
+
+FAKE_HOST = "fake-broker"
+FAKE_PORT = 1883
+
+
+@dataclass
+class PublishInfo:
+    """Результат публикации, как у paho.mqtt.client.MQTTMessageInfo."""
+
+    mid: int
+    rc: int = mqtt.MQTT_ERR_SUCCESS
+
+
+class FakeClient:
+    """Клиент paho в памяти.
+
+    Подключение и подтверждения публикаций приходят через цикл событий, как
+    если бы их доставил сетевой поток paho.
+    """
+
+    def __init__(self, connection: MqttConnection) -> None:
+        """Initialize."""
+        self._connection = connection
+        self._loop = connection.hass.loop
+        self._mids = itertools.count(1)
+        self.subscriptions: list[tuple[str, int]] = []
+        self.published = 0
+        self.last_published: tuple[str, Any] | None = None
+        # Перехват публикаций, например для имитации устройства.
+        self.on_publish_hook: Callable[[str, Any], None] | None = None
+
+    def connect(self, host: str, port: int = FAKE_PORT, keepalive: int = 60) -> int:
+        """Подключение: CONNACK приходит в следующей итерации цикла."""
+        self._loop.call_soon_threadsafe(
+            self._connection.on_connect, self, None, {}, mqtt.CONNACK_ACCEPTED
+        )
+        return mqtt.MQTT_ERR_SUCCESS
+
+    reconnect = connect
+
+    def disconnect(self) -> int:
+        """Отключение."""
+        self._loop.call_soon_threadsafe(
+            self._connection.on_disconnect, self, None, mqtt.MQTT_ERR_SUCCESS
+        )
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def loop_start(self) -> int:
+        """Сетевого потока нет."""
+        return mqtt.MQTT_ERR_SUCCESS
+
+    loop_stop = loop_misc = loop_read = loop_write = loop_start
+
+    def subscribe(self, topics: list[tuple[str, int]]) -> tuple[int, int]:
+        """Подписка."""
+        self.subscriptions.extend(topics)
+        return mqtt.MQTT_ERR_SUCCESS, next(self._mids)
+
+    def unsubscribe(self, topics: list[str]) -> tuple[int, int]:
+        """Отписка."""
+        self.subscriptions = [sub for sub in self.subscriptions if sub[0] not in topics]
+        return mqtt.MQTT_ERR_SUCCESS, next(self._mids)
+
+    def publish(
+        self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False
+    ) -> PublishInfo:
+        """Публикация: подтверждение приходит в следующей итерации цикла."""
+        mid = next(self._mids)
+        self.published += 1
+        self.last_published = (topic, payload)
+        self._loop.call_soon_threadsafe(self._connection.on_publish, self, None, mid)
+        if self.on_publish_hook is not None:
+            self._loop.call_soon_threadsafe(self.on_publish_hook, topic, payload)
+        return PublishInfo(mid)
+
+    def deliver(self, message: mqtt.MQTTMessage) -> None:
+        """Доставка входящего сообщения, как из сетевого потока paho."""
+        self._connection.on_message(self, None, message)
+
+
+def make_message(topic: str, payload: bytes) -> mqtt.MQTTMessage:
+    """Входящее сообщение paho."""
+    message = mqtt.MQTTMessage(topic=topic.encode())
+    message.payload = payload
+    return message
+
+
+def _fake_transport(base: type[MqttConnection]) -> type[MqttConnection]:
+    """Транспорт интеграции с клиентом в памяти вместо paho."""
+
+    class FakeConnection(base):  # type: ignore[valid-type,misc]
+        """Подключение к брокеру в памяти."""
+
+        def __init__(self, hass: HomeAssistant, data: dict[str, Any]) -> None:
+            """Initialize."""
+            super().__init__(hass, data)
+            self._client = FakeClient(self)  # type: ignore[assignment]
+
+    return FakeConnection
+
+
+FAKE_TRANSPORTS = {
+    f"fake_{TRANSPORT_ASYNCIO}": _fake_transport(AsyncioMqttConnection),
+    f"fake_{TRANSPORT_THREAD}": _fake_transport(MqttConnection),
+}
+TRANSPORTS.update(FAKE_TRANSPORTS)
+_probe = MqttClient._probe  # pylint: disable=protected-access
+
+
+def _fake_probe(self: MqttClient) -> bool:
+    """Проверка брокера при настройке записи: брокер в памяти доступен всегда."""
+    if self.data[CONF_HOST] == FAKE_HOST:
+        return True
+    return _probe(self)
+
+
+MqttClient._probe = _fake_probe  # type: ignore[method-assign]
+
+
+def device_data(index: int, transport: str = TRANSPORT_ASYNCIO) -> dict[str, Any]:
+    """Параметры записи устройства с номером index."""
+    return {
+        CONF_HOST: FAKE_HOST,
+        CONF_PORT: FAKE_PORT,
+        CONF_TOPIC: f"vakio{index}",
+        CONF_TRANSPORT: f"fake_{transport}",
+    }
+
+
+async def async_create_hass(config_dir: str) -> HomeAssistant:
+    """Незапущенный экземпляр HomeAssistant."""
+    hass = HomeAssistant(config_dir)
+    hass.data.setdefault(DOMAIN, {})
+    return hass
+
+
+async def async_create_hass_with_entries(config_dir: str) -> HomeAssistant:
+    """Незапущенный экземпляр HomeAssistant с реестрами и записями интеграций.
+
+    Интеграция загружается из этого репозитория, записи настраиваются через
+    hass.config_entries вместе с платформами.
+    """
+    hass = HomeAssistant(config_dir)
+    hass.config.skip_pip = True
+    loader.async_setup(hass)
+    await ar.async_load(hass)
+    await dr.async_load(hass)
+    await er.async_load(hass)
+    entity.async_setup(hass)
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    return hass
+
+
+async def async_add_entry(
+    hass: HomeAssistant,
+    index: int,
+    transport: str = TRANSPORT_ASYNCIO,
+    options: dict[str, Any] | None = None,
+    data: dict[str, Any] | None = None,
+) -> config_entries.ConfigEntry:
+    """Добавление и настройка записи устройства с номером index."""
+    entry = config_entries.ConfigEntry(
+        version=1,
+        minor_version=1,
+        domain=DOMAIN,
+        title=f"vakio{index}",
+        data=data or device_data(index, transport),
+        source=config_entries.SOURCE_USER,
+        options=options or {},
+    )
+    await hass.config_entries.async_add(entry)
+    await hass.async_block_till_done()
+    return entry
+
+
+async def async_drain(hass: HomeAssistant, rounds: int = 3) -> None:
+    """Выполнение запланированных в цикле событий вызовов."""
+    for _ in range(rounds):
+        await asyncio.sleep(0)
+    await hass.async_block_till_done()
+
+
+async def async_setup_devices(
+    hass: HomeAssistant,
+    count: int,
+    transport: str = TRANSPORT_ASYNCIO,
+    options: dict[str, Any] | None = None,
+) -> list[Coordinator]:
+    """Создание и подключение count устройств к общему брокеру в памяти."""
+    coordinators = []
+    for index in range(count):
+        coordinator = Coordinator(hass, device_data(index, transport), options)
+        hass.data[DOMAIN][f"entry{index}"] = coordinator
+        await coordinator.async_login()
+        coordinators.append(coordinator)
+    await async_drain(hass)
+    return coordinators
+
+
+def fake_client(hass: HomeAssistant, transport: str = TRANSPORT_ASYNCIO) -> FakeClient:
+    """Клиент в памяти общего подключения устройств."""
+    connection = get_pool(hass).get(device_data(0, transport))
+    assert connection is not None
+    return connection._client  # type: ignore[return-value]  # pylint: disable=protected-access
+
+
+async def async_teardown(hass: HomeAssistant, coordinators: list[Coordinator]) -> None:
+    """Отключение устройств и остановка hass."""
+    for coordinator in coordinators:
+        await coordinator.async_shutdown()
+        await coordinator.mqttc.disconnect()
+    await async_drain(hass)
+    await hass.async_stop(force=True)
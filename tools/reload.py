@@ -0,0 +1,201 @@
+"""Reload loop check of the Vakio Openair integration.
+
+Записи устройств настраиваются через hass.config_entries вместе с
+платформами и многократно перезагружаются: через async_reload и через
+изменение параметров (слушатель обновления записи). После прогрева число
+потоков, задач, таймеров цикла событий, слушателей, открытых файлов и
+подключений пула не должно расти. Результат - JSON, при росте код
+возврата 1:
+
+    python tools/reload.py --cycles 100 --devices 5
+
+По умолчанию используется клиент в памяти, с --host - настоящий брокер,
+например чтобы проверить закрытие сокетов при выгрузке во время
+переподключения.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import tempfile
+import threading
+from typing import Any
+
+import harness
+
+# pylint: disable=wrong-import-order
+from custom_components.vakio_openair.connection import get_pool
+from custom_components.vakio_openair.const import (
+    CONF_HOST,
+    CONF_PORT,
+    CONF_TRANSPORT,
+    DOMAIN,
+    OPT_COMMAND_TIMEOUT,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_THREAD,
+)
+from custom_components.vakio_openair.vakio import Coordinator
+from homeassistant.config_entries import ConfigEntry, ConfigEntryState
+from homeassistant.core import HomeAssistant
+
+
+def snapshot(hass: HomeAssistant, entries: list[ConfigEntry]) -> dict[str, int]:
+    """Ресурсы процесса и интеграции, которые могут утекать при перезагрузке."""
+    # Пара сокетов paho закрывается в Client.__del__, а клиент связан с
+    # подключением циклическими ссылками через обработчики.
+    gc.collect()
+    pool = get_pool(hass)
+    coordinators: list[Coordinator] = list(hass.data.get(DOMAIN, {}).values())
+    # pylint: disable=protected-access
+    # Пул потоков цикла событий растёт по нагрузке до своего предела и
+    # утечкой не считается.
+    executor = hass.loop._default_executor  # type: ignore[attr-defined]
+    workers = len(executor._threads) if executor is not None else 0
+    result = {
+        "threads": threading.active_count() - workers,
+        "tasks": len(asyncio.all_tasks()),
+        "timers": sum(
+            not handle.cancelled() for handle in hass.loop._scheduled  # type: ignore[attr-defined]
+        ),
+        "bus_listeners": sum(hass.bus.async_listeners().values()),
+        "update_listeners": sum(len(entry.update_listeners) for entry in entries),
+        "coordinators": len(coordinators),
+        "coordinator_listeners": sum(
+            len(coordinator._listeners) for coordinator in coordinators
+        ),
+        "entities": len(hass.states.async_all()),
+        "connections": len(pool._connections),
+        "refs": sum(connection.refs for connection in pool._connections.values()),
+        "probes": len(pool._probes),
+    }
+    if os.path.isdir("/proc/self/fd"):
+        result["fds"] = len(os.listdir("/proc/self/fd"))
+    return result
+
+
+async def async_settle(hass: HomeAssistant) -> None:
+    """Ожидание фоновых задач перезагрузки, например подключения, перед подсчётом."""
+    previous = None
+    for _ in range(20):
+        await harness.async_drain(hass)
+        count = len(asyncio.all_tasks())
+        if count == previous:
+            return
+        previous = count
+        await asyncio.sleep(0.05)
+
+
+def device_data(index: int, args: argparse.Namespace) -> dict[str, Any]:
+    """Параметры записи: брокер в памяти или настоящий при заданном --host."""
+    data = harness.device_data(index, args.transport)
+    if args.host:
+        data.update(
+            {CONF_HOST: args.host, CONF_PORT: args.port, CONF_TRANSPORT: args.transport}
+        )
+    return data
+
+
+async def async_cycle(
+    hass: HomeAssistant,
+    entries: list[ConfigEntry],
+    args: argparse.Namespace,
+    cycle: int,
+) -> None:
+    """Перезагрузка всех записей.
+
+    Чётные циклы перезагружают записи через async_reload, нечётные - сменой
+    параметров, как из формы настроек.
+    """
+    for entry in entries:
+        if cycle % 2:
+            hass.config_entries.async_update_entry(
+                entry, options={**entry.options, OPT_COMMAND_TIMEOUT: 10 + cycle % 4}
+            )
+        else:
+            await hass.config_entries.async_reload(entry.entry_id)
+    # Выгрузка сразу после запуска попадает на незавершённое подключение.
+    if args.settle:
+        await asyncio.sleep(args.settle)
+    await harness.async_drain(hass)
+    for entry in entries:
+        if entry.state is not ConfigEntryState.LOADED:
+            raise SystemExit(f"Entry {entry.title} is {entry.state} after reload")
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    """Прогрев, циклы перезагрузки и сравнение ресурсов до и после."""
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await harness.async_create_hass_with_entries(config_dir)
+        entries = [
+            await harness.async_add_entry(hass, index, data=device_data(index, args))
+            for index in range(args.devices)
+        ]
+        for cycle in range(args.warmup):
+            await async_cycle(hass, entries, args, cycle)
+        await async_settle(hass)
+        before = snapshot(hass, entries)
+        for cycle in range(args.warmup, args.warmup + args.cycles):
+            await async_cycle(hass, entries, args, cycle)
+        await async_settle(hass)
+        after = snapshot(hass, entries)
+        for entry in entries:
+            await hass.config_entries.async_unload(entry.entry_id)
+        await async_settle(hass)
+        unloaded = snapshot(hass, entries)
+        await hass.async_stop(force=True)
+    growth = {
+        key: after[key] - before[key] for key in before if after[key] > before[key]
+    }
+    # После выгрузки всех записей от интеграции ничего не должно остаться.
+    leftovers = {
+        key: unloaded[key]
+        for key in (
+            "update_listeners",
+            "coordinators",
+            "coordinator_listeners",
+            "connections",
+            "refs",
+            "probes",
+        )
+        if unloaded[key]
+    }
+    return {
+        "cycles": args.cycles,
+        "devices": args.devices,
+        "before": before,
+        "after": after,
+        "unloaded": unloaded,
+        "growth": growth,
+        "leftovers": leftovers,
+    }
+
+
+def main() -> None:
+    """Разбор аргументов, прогон и вывод JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=100)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--devices", type=int, default=5)
+    parser.add_argument(
+        "--settle", type=float, default=0.0, help="seconds between reload and check"
+    )
+    parser.add_argument(
+        "--transport",
+        choices=[TRANSPORT_ASYNCIO, TRANSPORT_THREAD],
+        default=TRANSPORT_ASYNCIO,
+    )
+    parser.add_argument("--host", help="real MQTT broker instead of the fake one")
+    parser.add_argument("--port", type=int, default=1883)
+    args = parser.parse_args()
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if report["growth"] or report["leftovers"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Accelerated replay of Vakio Openair MQTT traces.
+
+Входящие сообщения трассировки (параметр "Записывать трассировку MQTT")
+передаются через on_message подключения и пути обновления сущностей
+вентилятора и датчиков, без брокера и сети. Исходящие сообщения только
+учитываются в отчёте. Результат - JSON:
+
+    python tools/replay.py config/vakio_openair_trace/vakio.jsonl --speed 100
+
+Скорость 1 повторяет исходные интервалы, 0 - без пауз. С --profile
+выводится профиль cProfile самых затратных функций.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+import cProfile
+import io
+import json
+import pstats
+import tempfile
+import time
+from typing import Any
+
+import harness
+
+# pylint: disable=wrong-import-order
+from custom_components.vakio_openair.const import (
+    CONF_TOPIC,
+    DOMAIN,
+    OPT_SMART_TOPIC_ENDPOINT,
+    OPT_SMART_TOPIC_PREFIX,
+    TRANSPORT_ASYNCIO,
+    TRANSPORT_THREAD,
+)
+from custom_components.vakio_openair.fan import (
+    LIMITED_SUPPORT,
+    PRESET_MODS,
+    VakioOpenAirFan,
+)
+from custom_components.vakio_openair.sensor import VakioSensor
+from custom_components.vakio_openair.trace import INBOUND, read_trace
+from custom_components.vakio_openair.vakio import (
+    FAN_ENDPOINTS,
+    HUD_ENDPOINT,
+    TEMP_ENDPOINT,
+    Coordinator,
+)
+from homeassistant.components.sensor import SensorDeviceClass, SensorStateClass
+
+Record = tuple[float, str, str, str]
+
+
+def device_topic(topic: str) -> str:
+    """Топик устройства по топику входящего сообщения."""
+    prefix = f"{OPT_SMART_TOPIC_PREFIX}/"
+    suffix = f"/{OPT_SMART_TOPIC_ENDPOINT}"
+    if topic.startswith(prefix) and topic.endswith(suffix):
+        return topic[len(prefix) : -len(suffix)]
+    return topic.rsplit("/", 1)[0]
+
+
+def load(paths: list[str]) -> list[Record]:
+    """Записи всех файлов в порядке времени."""
+    records = [record for path in paths for record in read_trace(path)]
+    records.sort(key=lambda record: record[0])
+    return records
+
+
+class Device:
+    """Координатор и сущности одного устройства с учётом изменений."""
+
+    def __init__(self, hass, coordinator: Coordinator, entry_id: str) -> None:
+        """Initialize."""
+        self.coordinator = coordinator
+        self.changes: Counter[str] = Counter()
+        topic = coordinator.mqttc.topic
+        self.fan = VakioOpenAirFan(
+            hass, topic, "OpenAir", entry_id, LIMITED_SUPPORT, PRESET_MODS  # type: ignore
+        )
+        self.sensors = {
+            endpoint: VakioSensor(
+                hass,
+                entry_id,
+                f"{topic}_{endpoint}",
+                None,
+                None,
+                device_class,
+                SensorStateClass.MEASUREMENT,
+                None,
+            )
+            for endpoint, device_class in (
+                (TEMP_ENDPOINT, SensorDeviceClass.TEMPERATURE),
+                (HUD_ENDPOINT, SensorDeviceClass.HUMIDITY),
+            )
+        }
+        # Подписки как у сущностей, но без записи состояния в hass.
+        coordinator.async_add_listener(self._update_fan, FAN_ENDPOINTS)
+        for endpoint in self.sensors:
+            coordinator.async_add_listener(
+                lambda endpoint=endpoint: self._update_sensor(endpoint),
+                frozenset({endpoint}),
+            )
+
+    def _update_fan(self) -> None:
+        """Обновление вентилятора."""
+        if self.fan.update_state():
+            self.changes["fan"] += 1
+
+    def _update_sensor(self, endpoint: str) -> None:
+        """Обновление датчика."""
+        if self.sensors[endpoint].update_value():
+            self.changes[endpoint] += 1
+
+    def report(self) -> dict[str, Any]:
+        """Число изменений сущностей и итоговое состояние."""
+        return {
+            "changes": dict(self.changes),
+            "state": self.coordinator.condition.as_dict(),
+            "fan": {
+                "percentage": self.fan.percentage,
+                "preset_mode": self.fan.preset_mode,
+            },
+        }
+
+
+async def replay(records: list[Record], args: argparse.Namespace) -> dict[str, Any]:
+    """Подача входящих записей в интеграцию с ускорением args.speed."""
+    inbound = [record for record in records if record[1] == INBOUND]
+    topics = sorted({device_topic(record[2]) for record in inbound})
+    options = json.loads(args.options) if args.options else None
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await harness.async_create_hass(config_dir)
+        coordinators = []
+        devices: dict[str, Device] = {}
+        for index, topic in enumerate(topics):
+            data = {**harness.device_data(index, args.transport), CONF_TOPIC: topic}
+            coordinator = Coordinator(hass, data, options)
+            entry_id = f"entry{index}"
+            hass.data[DOMAIN][entry_id] = coordinator
+            await coordinator.async_login()
+            coordinators.append(coordinator)
+            devices[topic] = Device(hass, coordinator, entry_id)
+        await harness.async_drain(hass)
+        client = harness.fake_client(hass, args.transport)
+
+        profiler = cProfile.Profile() if args.profile else None
+        if profiler is not None:
+            profiler.enable()
+        started = time.perf_counter()
+        first = inbound[0][0] if inbound else 0.0
+        for timestamp, _, topic, payload in inbound:
+            if args.speed > 0:
+                delay = (timestamp - first) / args.speed
+                delay -= time.perf_counter() - started
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            client.deliver(harness.make_message(topic, payload.encode()))
+            await asyncio.sleep(0)
+        await harness.async_drain(hass)
+        elapsed = time.perf_counter() - started
+        if profiler is not None:
+            profiler.disable()
+
+        report: dict[str, Any] = {
+            "records": len(records),
+            "inbound": len(inbound),
+            "outbound": len(records) - len(inbound),
+            "traced_s": round(inbound[-1][0] - first, 3) if inbound else 0.0,
+            "elapsed_s": round(elapsed, 3),
+            "msgs_per_s": round(len(inbound) / elapsed) if elapsed else None,
+            "devices": {topic: device.report() for topic, device in devices.items()},
+        }
+        if profiler is not None:
+            stream = io.StringIO()
+            pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(
+                args.profile
+            )
+            report["profile"] = stream.getvalue().splitlines()
+        await harness.async_teardown(hass, coordinators)
+    return report
+
+
+def main() -> None:
+    """Разбор аргументов, воспроизведение и вывод JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("trace", nargs="+", help="trace files, merged by time")
+    parser.add_argument("--speed", type=float, default=100.0)
+    parser.add_argument("--options", help="integration options as JSON")
+    parser.add_argument(
+        "--transport",
+        choices=[TRANSPORT_ASYNCIO, TRANSPORT_THREAD],
+        default=TRANSPORT_ASYNCIO,
+    )
+    parser.add_argument(
+        "--profile", type=int, nargs="?", const=25, help="print N hottest functions"
+    )
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(replay(load(args.trace), args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
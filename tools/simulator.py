@@ -0,0 +1,392 @@
+"""Virtual Vakio Openair devices for load testing.
+
+Устройства публикуют сохраняемые значения конечных точек, выполняют команды
+с задержкой и могут их терять, а показания датчиков медленно дрейфуют.
+
+Нагрузочный прогон интеграции с брокером в памяти:
+
+    python tools/simulator.py load --devices 500 --commands 2000 --drop 0.01
+
+Устройства для настоящего брокера, например для проверки установленной
+интеграции:
+
+    python tools/simulator.py broker --host 127.0.0.1 --devices 50
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections.abc import Callable
+import json
+import logging
+import random
+import statistics
+import tempfile
+import time
+from typing import Any
+
+import harness
+import paho.mqtt.client as mqtt
+
+# pylint: disable=wrong-import-order
+from custom_components.vakio_openair.const import (
+    OPENAIR_GATE_LIST,
+    OPENAIR_SPEED_LIST,
+    OPENAIR_STATE_OFF,
+    OPENAIR_STATE_ON,
+    OPENAIR_WORKMODE_MANUAL,
+    OPT_COMMAND_TIMEOUT,
+)
+from custom_components.vakio_openair.fan import (
+    LIMITED_SUPPORT,
+    PRESET_MODS,
+    VakioOpenAirFan,
+)
+from custom_components.vakio_openair.vakio import (
+    ENDPOINT_DECODERS,
+    FAN_ENDPOINTS,
+    GATE_ENDPOINT,
+    HUD_ENDPOINT,
+    SPEED_ENDPOINT,
+    STATE_ENDPOINT,
+    TEMP_ENDPOINT,
+    WORKMODE_ENDPOINT,
+)
+
+Publish = Callable[[str, bytes], None]
+
+
+class VirtualDevice:
+    """Виртуальное устройство Openair.
+
+    Команда - это публикация значения в топик конечной точки, отличного от
+    текущего. Устройство теряет её с вероятностью drop, иначе применяет через
+    случайную задержку из delay и публикует новое значение.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        loop: asyncio.AbstractEventLoop,
+        publish: Publish,
+        delay: tuple[float, float] = (0.0, 0.0),
+        drop: float = 0.0,
+        rng: random.Random | None = None,
+    ) -> None:
+        """Initialize."""
+        self.topic = topic
+        self._loop = loop
+        self._publish = publish
+        self.delay = delay
+        self.drop = drop
+        self._rng = rng or random.Random()
+        self.state: dict[str, Any] = {
+            SPEED_ENDPOINT: 2,
+            GATE_ENDPOINT: OPENAIR_GATE_LIST[-1],
+            STATE_ENDPOINT: OPENAIR_STATE_ON,
+            WORKMODE_ENDPOINT: OPENAIR_WORKMODE_MANUAL,
+            TEMP_ENDPOINT: round(self._rng.uniform(18, 24), 1),
+            HUD_ENDPOINT: round(self._rng.uniform(35, 55), 1),
+        }
+        self.commands = 0
+        self.dropped = 0
+
+    def publish_all(self) -> None:
+        """Публикация всех значений устройства."""
+        for endpoint, value in self.state.items():
+            self._publish(f"{self.topic}/{endpoint}", str(value).encode())
+
+    def on_message(self, endpoint: str, payload: bytes) -> None:
+        """Сообщение в топик устройства: команда, если значение отличается."""
+        decoder = ENDPOINT_DECODERS.get(endpoint)
+        if decoder is None or endpoint not in FAN_ENDPOINTS:
+            return
+        try:
+            value = decoder(payload)
+        except ValueError:
+            return
+        if value == self.state[endpoint]:
+            return
+        self.commands += 1
+        if self._rng.random() < self.drop:
+            self.dropped += 1
+            return
+        self._loop.call_later(
+            self._rng.uniform(*self.delay), self._apply, endpoint, value
+        )
+
+    def _apply(self, endpoint: str, value: Any) -> None:
+        """Выполнение команды и публикация нового значения."""
+        self.state[endpoint] = value
+        self._publish(f"{self.topic}/{endpoint}", str(value).encode())
+
+    def drift(self) -> None:
+        """Изменение показаний датчиков."""
+        for endpoint, low, high in ((TEMP_ENDPOINT, 10, 35), (HUD_ENDPOINT, 20, 80)):
+            value = self.state[endpoint] + self._rng.uniform(-0.3, 0.3)
+            self.state[endpoint] = round(min(high, max(low, value)), 1)
+            self._publish(
+                f"{self.topic}/{endpoint}", str(self.state[endpoint]).encode()
+            )
+
+
+class InProcessBroker:
+    """Брокер в памяти для интеграции и виртуальных устройств.
+
+    Это не универсальный брокер: сообщение доставляется интеграции и
+    устройству, которому принадлежит первый уровень топика. Публикации
+    интеграции возвращаются ей же, как при подписке на собственный топик в
+    MQTT 3.1.1; без echo подтверждение приходит только от устройства.
+    """
+
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, client: harness.FakeClient
+    ) -> None:
+        """Initialize."""
+        self._loop = loop
+        self._client = client
+        self.devices: dict[str, VirtualDevice] = {}
+        self.latency = 0.0
+        self.echo = True
+        self.messages = 0
+        client.on_publish_hook = self._publish_from_integration
+
+    def publish(self, topic: str, payload: Any) -> None:
+        """Публикация устройства."""
+        self._schedule(topic, payload, True)
+
+    def _publish_from_integration(self, topic: str, payload: Any) -> None:
+        """Публикация интеграции."""
+        self._schedule(topic, payload, self.echo)
+
+    def _schedule(self, topic: str, payload: Any, to_integration: bool) -> None:
+        """Доставка сообщения подписчикам с задержкой брокера."""
+        # Как paho: числа и строки передаются текстом в байтах.
+        if not isinstance(payload, bytes):
+            payload = str(payload).encode()
+        if self.latency:
+            self._loop.call_later(
+                self.latency, self._deliver, topic, payload, to_integration
+            )
+        else:
+            self._deliver(topic, payload, to_integration)
+
+    def _deliver(self, topic: str, payload: bytes, to_integration: bool) -> None:
+        """Доставка без задержки."""
+        self.messages += 1
+        if to_integration:
+            self._client.deliver(harness.make_message(topic, payload))
+        device_topic, _, endpoint = topic.partition("/")
+        device = self.devices.get(device_topic)
+        if device is not None:
+            device.on_message(endpoint, payload)
+
+
+def random_command(device: VirtualDevice, rng: random.Random) -> tuple[str, Any]:
+    """Случайная команда, меняющая состояние устройства."""
+    endpoint = rng.choice([SPEED_ENDPOINT, GATE_ENDPOINT, STATE_ENDPOINT])
+    if endpoint == SPEED_ENDPOINT:
+        choices = OPENAIR_SPEED_LIST
+    elif endpoint == GATE_ENDPOINT:
+        choices = OPENAIR_GATE_LIST
+    else:
+        choices = [OPENAIR_STATE_ON, OPENAIR_STATE_OFF]
+    return endpoint, rng.choice([v for v in choices if v != device.state[endpoint]])
+
+
+async def run_load(args: argparse.Namespace) -> dict[str, Any]:
+    """Нагрузочный прогон: команды через координаторы до подтверждения."""
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = await harness.async_create_hass(config_dir)
+        started = time.perf_counter()
+        coordinators = await harness.async_setup_devices(
+            hass, args.devices, options={OPT_COMMAND_TIMEOUT: args.timeout}
+        )
+        client = harness.fake_client(hass)
+        broker = InProcessBroker(hass.loop, client)
+        broker.latency = args.latency
+        broker.echo = not args.no_echo
+        for coordinator in coordinators:
+            topic = coordinator.mqttc.topic
+            device = VirtualDevice(
+                topic, hass.loop, broker.publish, tuple(args.delay), args.drop, rng
+            )
+            broker.devices[topic] = device  # type: ignore[index]
+            device.publish_all()
+
+        # Сущности пересчитывают состояние при каждом уведомлении координатора.
+        for index, coordinator in enumerate(coordinators):
+            fan = VakioOpenAirFan(
+                hass,
+                f"fan{index}",
+                "OpenAir",
+                f"entry{index}",
+                LIMITED_SUPPORT,
+                PRESET_MODS,
+            )
+            coordinator.async_add_listener(fan.update_state, FAN_ENDPOINTS)
+        await harness.async_drain(hass)
+        setup = time.perf_counter() - started
+
+        outstanding: dict[tuple[int, str], tuple[Any, Any, float]] = {}
+        latencies: list[float] = []
+        rolled_back = 0
+        superseded = 0
+        sent = 0
+        interval = 1 / args.rate if args.rate else 0
+        next_drift = time.perf_counter() + args.drift if args.drift else None
+        deadline = None
+        while sent < args.commands or outstanding:
+            now = time.perf_counter()
+            if sent < args.commands:
+                index = rng.randrange(args.devices)
+                coordinator = coordinators[index]
+                device = broker.devices[coordinator.mqttc.topic]  # type: ignore[index]
+                endpoint, value = random_command(device, rng)
+                coordinator.async_queue_command(endpoint, value)
+                # Предыдущая команда той же точки заменяется новой.
+                if outstanding.pop((index, endpoint), None) is not None:
+                    superseded += 1
+                outstanding[(index, endpoint)] = (coordinator, value, now)
+                sent += 1
+            elif deadline is None:
+                deadline = now + args.timeout + 1
+            if next_drift is not None and now >= next_drift:
+                for device in broker.devices.values():
+                    device.drift()
+                next_drift = now + args.drift
+            for key, (coordinator, value, issued) in list(outstanding.items()):
+                endpoint = key[1]
+                if coordinator.is_pending(endpoint):
+                    continue
+                del outstanding[key]
+                if coordinator.condition[endpoint] == value:
+                    latencies.append(now - issued)
+                else:
+                    rolled_back += 1
+            if deadline is not None and now > deadline:
+                break
+            await asyncio.sleep(interval)
+
+        result = {
+            "devices": args.devices,
+            "setup_s": round(setup, 3),
+            "commands": sent,
+            "confirmed": len(latencies),
+            "superseded": superseded,
+            "rolled_back": rolled_back,
+            "unresolved": len(outstanding),
+            "dropped_by_devices": sum(d.dropped for d in broker.devices.values()),
+            "broker_messages": broker.messages,
+            "published": client.published,
+        }
+        if len(latencies) >= 2:
+            # Inclusive: процентили не выходят за пределы выборки.
+            cuts = statistics.quantiles(latencies, n=100, method="inclusive")
+            result["confirm_latency_ms"] = {
+                "p50": round(cuts[49] * 1e3, 2),
+                "p95": round(cuts[94] * 1e3, 2),
+                "p99": round(cuts[98] * 1e3, 2),
+                "max": round(max(latencies) * 1e3, 2),
+            }
+        await harness.async_teardown(hass, coordinators)
+    return result
+
+
+async def run_broker(args: argparse.Namespace) -> None:
+    """Виртуальные устройства на настоящем брокере, до прерывания."""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(args.seed)
+    client = mqtt.Client()
+    if args.username:
+        client.username_pw_set(args.username, args.password)
+
+    def publish(topic: str, payload: bytes) -> None:
+        client.publish(topic, payload, qos=1, retain=True)
+
+    devices = {
+        f"{args.prefix}{index}": VirtualDevice(
+            f"{args.prefix}{index}", loop, publish, tuple(args.delay), args.drop, rng
+        )
+        for index in range(args.devices)
+    }
+
+    def on_connect(client, userdata, flags, rc):  # pylint: disable=invalid-name
+        client.subscribe([(f"{topic}/+", 1) for topic in devices])
+
+    def on_message(client, userdata, message):
+        device_topic, _, endpoint = message.topic.partition("/")
+        device = devices.get(device_topic)
+        if device is not None:
+            loop.call_soon_threadsafe(device.on_message, endpoint, message.payload)
+
+    client.on_connect = on_connect
+    client.on_message = on_message
+    client.connect(args.host, args.port)
+    client.loop_start()
+    for device in devices.values():
+        device.publish_all()
+    try:
+        while True:
+            await asyncio.sleep(args.drift or 3600)
+            if args.drift:
+                for device in devices.values():
+                    device.drift()
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+
+def main() -> None:
+    """Разбор аргументов и запуск."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("mode", choices=["load", "broker"])
+    parser.add_argument("--devices", type=int, default=100)
+    parser.add_argument(
+        "--delay",
+        type=float,
+        nargs=2,
+        default=[0.02, 0.2],
+        metavar=("MIN", "MAX"),
+        help="device response delay range, seconds",
+    )
+    parser.add_argument("--drop", type=float, default=0.0, help="command drop rate")
+    parser.add_argument(
+        "--drift", type=float, default=0.0, help="sensor update period, seconds"
+    )
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--log-level", default="error")
+    load = parser.add_argument_group("load")
+    load.add_argument("--commands", type=int, default=1000)
+    load.add_argument("--rate", type=float, default=500, help="commands per second")
+    load.add_argument("--latency", type=float, default=0.0, help="broker latency, s")
+    load.add_argument("--timeout", type=float, default=5, help="command timeout, s")
+    load.add_argument(
+        "--no-echo",
+        action="store_true",
+        help=(
+            "do not return integration publishes to it, unlike an MQTT 3.1.1 broker;"
+            " the integration then takes device replies for its own echo"
+        ),
+    )
+    broker = parser.add_argument_group("broker")
+    broker.add_argument("--host", default="127.0.0.1")
+    broker.add_argument("--port", type=int, default=1883)
+    broker.add_argument("--username")
+    broker.add_argument("--password")
+    broker.add_argument("--prefix", default="vakio")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    if args.mode == "load":
+        print(json.dumps(asyncio.run(run_load(args)), indent=2))
+    else:
+        try:
+            asyncio.run(run_broker(args))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()